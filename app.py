@@ -1,21 +1,33 @@
+import json
+import math
 import os
+import sys
 import traceback
+from datetime import datetime
 
-from db.ponds_query import get_ponds
+from db.ponds_query import ponds_cache
 from logger import logger
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, url_for
 from flask_swagger_ui import get_swaggerui_blueprint
 from dotenv import load_dotenv
 from marshmallow import ValidationError
 
-from utils.add_tags import add_tags
-from utils.create_lead import create_ghl_lead
-from utils.create_note import create_lead_property_inquiry
-from utils.create_tasks import create_task
-from utils.delete_lead import _delete_lead
-from utils.update_lead import _update_lead, add_followers
+from utils import async_client, metrics
+from utils.add_tags import add_tags_async
+from utils.bulk_import import import_leads
+from utils.circuit_breaker import UpstreamUnavailable, circuit_breakers
+from utils.create_lead import create_lead_result, create_lead_result_async
+from utils.create_note import create_lead_property_inquiry_async
+from utils.create_tasks import create_task_async
+from utils.delete_lead import _delete_lead_async
+from utils.idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, IN_PROGRESS, MISMATCH, REPLAY, idempotency_store, request_key
+from utils.http_client import UpstreamRateLimited
+from utils.jobs import job_queue
+from utils.update_lead import _update_lead_async, add_followers_async
+from utils.users_directory import users_directory
+from utils.rate_limiter import RateLimitExceeded
 from utils.slack_troubleshooting import send_slack_notification
-from utils.utils import _get_lead_by_email, _get_user_by_email, _get_lead_by_id, _get_users_list, _get_user_by_id
+from utils.utils import _get_lead_by_email_async, _get_user_by_email, _get_lead_by_id_async, _get_users_list, _get_user_by_id
 from validation.add_tags_validation import tags_validation
 from validation.followers_validation import followers_schema
 from validation.get_lead_validation import get_lead_by_email_schema
@@ -25,10 +37,13 @@ from validation.task_validation import task_validation
 from validation.update_lead_validation import update_lead_schema
 
 app = Flask(__name__)
+metrics.init_app(app)
 
 load_dotenv()
 
 API_KEY = os.getenv("FLASK_API_KEY")
+# Seconds clients and proxies may reuse a read response before revalidating it with its ETag; 0 = always revalidate
+READ_CACHE_MAX_AGE = int(os.getenv("READ_CACHE_MAX_AGE", "0"))
 
 # Swagger
 SWAGGER_URL = "/swagger"
@@ -36,10 +51,112 @@ API_DOCS = "/static/swagger.json"
 swagger_ui = get_swaggerui_blueprint(SWAGGER_URL, API_DOCS)
 app.register_blueprint(swagger_ui, url_prefix=SWAGGER_URL)
 
+# Routes that talk to upstreams are plain views handing their async helper to the shared upstream loop
+# (utils.async_client.run): the helper's upstream calls run concurrently there while the server thread waits.
+# Requests in flight per process are capped by SERVER_THREADS (serve.py)
+
+# Background lead jobs (POST /lead?async=true)
+CREATE_LEAD_JOB = "create_lead"
+job_queue.register(CREATE_LEAD_JOB, create_lead_result)
+job_queue.start()
+
+
+def _upstream_unavailable(error: UpstreamUnavailable, **body):
+    # Fail fast while a circuit breaker is open; no Slack message, the breaker logged the outage once
+    logger.warning("%s, answering 503", error)
+    return jsonify({"message": str(error), **body}), 503, {"Retry-After": str(error.retry_after)}
+
+
+def _rate_limited(error, **body):
+    # GHL throttling, from our own bucket or from GHL's 429s, is expected under load: tell the caller when to
+    # retry instead of paging Slack
+    logger.warning("%s, answering 429", error)
+    return jsonify({"message": str(error), **body}), 429, {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+
+
+def _idempotent(payload: dict, produce):
+    """Run ``produce()`` once per idempotency key and replay its response to retries.
+
+    The key is the Idempotency-Key header or, without one, a hash of the validated payload; see
+    utils/idempotency.py. ``produce`` is a callable returning ``(body, status, headers)``.
+    """
+    header_key = request.headers.get("Idempotency-Key")
+    if header_key is not None and not 0 < len(header_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        return jsonify({"message": f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters"}), 400
+    # ?async (or Prefer: respond-async) turns a 201 into a 202 with a job, so a sync and an async call must not
+    # replay each other's response
+    scope = request.full_path.rstrip("?")
+    if _wants_async():
+        scope += " respond-async"
+    key, fingerprint, ttl = request_key(request.method, scope, header_key, payload)
+    outcome, stored = idempotency_store.acquire(key, fingerprint)
+    if outcome == REPLAY:
+        logger.info("Replaying the stored response of %s %s", request.method, request.path)
+        return jsonify(stored["body"]), stored["status"], {**stored["headers"], "Idempotent-Replayed": "true"}
+    if outcome == MISMATCH:
+        return jsonify({"message": "Idempotency-Key was already used with a different payload"}), 422
+    if outcome == IN_PROGRESS:
+        message = "A request with the same idempotency key is still being processed"
+        return jsonify({"message": message}), 409, {"Retry-After": "5"}
+
+    try:
+        body, status, headers = produce()
+    except BaseException:
+        idempotency_store.release(key)
+        raise
+    if 200 <= status < 300:
+        idempotency_store.complete(key, {"body": body, "status": status, "headers": headers}, ttl)
+    else:
+        idempotency_store.release(key)
+    return jsonify(body), status, headers
+
+
+def _wants_async() -> bool:
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        return True
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _conditional_json(body: dict, etag: str = None, last_modified: str = None):
+    # 200 read responses carry an ETag (a hash of the body unless the caller has a cheaper one) and
+    # Last-Modified when the payload has a timestamp; a matching If-None-Match/If-Modified-Since gets a 304
+    response = jsonify(body)
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    modified_at = _parse_timestamp(last_modified)
+    if modified_at:
+        response.last_modified = modified_at
+    if READ_CACHE_MAX_AGE:
+        response.cache_control.max_age = READ_CACHE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    # Responses differ per API key, so shared caches must not hand one caller's copy to another
+    response.vary.add("X-API-KEY")
+    return response.make_conditional(request)
+
 
 @app.route("/health")
 def health():
-    return "Healthy", 200
+    # Stays 200 while upstreams are down: the container restart a failing health check triggers can't fix them
+    upstreams = circuit_breakers.snapshot()
+    degraded = any(breaker["state"] != "closed" for breaker in upstreams.values())
+    return jsonify({"status": "degraded" if degraded else "healthy", "upstreams": upstreams}), 200
+
+
+@app.route("/metrics")
+def get_metrics():
+    # Prometheus scrape target, unauthenticated like /health; carries no lead data
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
 
 @app.route('/')
@@ -55,42 +172,72 @@ def create_lead():
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received lead request with such payload:\n{request.json}")
+    logger.info("Received lead request with such payload:\n%s", request.json)
     # end auth block _____________________________________________
 
     # create lead block _______________________________________
     try:
         #  Validate data and check if property is in payload
         validated_data = post_lead_schema.load(request.json)
-        has_property = 'property' in validated_data
 
-        lead = create_ghl_lead(validated_data, has_property)
+        def create():
+            # Opt-in async mode: persist the job and let the caller poll GET /jobs/<id>
+            if _wants_async():
+                job_id = job_queue.enqueue(CREATE_LEAD_JOB, validated_data)
+                logger.info("Lead request queued as job %s", job_id)
+                status_url = url_for("get_job_status", job_id=job_id)
+                body = {"message": "Lead accepted for processing", "job_id": job_id, "status_url": status_url}
+                return body, 202, {"Location": status_url}
 
-        if not lead:
-            logger.info(f"User was not created\n{lead}")
-            return jsonify({"message": f"User was not created, already exists. Added inquiry note if provided", "contact": lead}), 200
+            result, status_code = async_client.run(create_lead_result_async(validated_data))
+            return result, status_code, {}
 
-        logger.info(f"User was created\n{lead}")
-        return jsonify(
-            {
-                "message": "Lead successfully created",
-                "contact": lead.get("contact")
-            }
-        ), 201
+        # Webhook retries of the same lead replay the first response instead of creating it again
+        return _idempotent(validated_data, create)
 
     except ValidationError as err:  # Handling Validation Error
         send_slack_notification("Validation Error while creating lead\n" + str(err))
-        logger.error("Validation Error while creating lead\n" + str(err))
+        logger.error("Validation Error while creating lead\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "contact": None}), 406
 
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:  # Handling any other Error
         error_msg = traceback.format_exc()
         send_slack_notification("Error while creating lead\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while creating lead\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while creating lead\n%s\n%s", e, error_msg)
         return jsonify({"message": f"error: {e}", "contact": None}), 400
     # end create lead block ___________________________________________
 
 
+@app.route('/leads/bulk', methods=['POST'])
+def bulk_create_leads():
+    provided_key = request.headers.get("X-API-KEY")
+    if provided_key != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    logger.info("Received bulk lead import request")
+
+    # One PostLeadSchema record per line in, one result per line out as soon as each lead is done
+    def generate():
+        for result in import_leads(request.stream):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route('/jobs/<string:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    provided_key = request.headers.get("X-API-KEY")
+    if provided_key != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"message": f"There is no such job with id = {job_id}", "job": None}), 404
+    return jsonify({"message": f"Job is {job['status']}", "job": job}), 200
+
+
 @app.route('/lead/<string:lead_id>', methods=['PUT'])
 def update_lead(lead_id):
 
@@ -98,25 +245,29 @@ def update_lead(lead_id):
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received lead update request with such payload:\n{request.json}")
+    logger.info("Received lead update request with such payload:\n%s", request.json)
     # end auth block _____________________________________________
 
     # update lead block ____________________________________________
     try:
         validated_data = update_lead_schema.load(request.json)
-        updated_lead = _update_lead(validated_data, lead_id)
-        logger.info(f"{updated_lead}")
+        updated_lead = async_client.run(_update_lead_async(validated_data, lead_id))
+        logger.info("%s", updated_lead)
         if not updated_lead:
-            logger.info(f"User was not updated")
+            logger.info("User was not updated")
             return jsonify({"message": f"User was not updated", "contact": None}), 202
     except ValidationError as err:
         send_slack_notification("Validation Error while updating lead\n" + str(err))
-        logger.error("Validation Error while updating lead\n" + str(err))
+        logger.error("Validation Error while updating lead\n%s", err)
         return jsonify({"message": f"Validation error while updating lead {err.messages}", "contact": None}), 406
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while updating lead\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while updating lead\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while updating lead\n%s\n%s", e, error_msg)
         return jsonify({"message": f"Error: {e}", "contact": None}), 400
     return jsonify({"contact": updated_lead, "message": "Lead is successfully updated"}), 200
     # end update lead block ______________________________
@@ -129,27 +280,31 @@ def delete_lead(lead_id):
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received lead delete request")
+    logger.info("Received lead delete request")
     # end auth block _____________________________________________
 
     # delete lead block ____________________________________________
     try:
 
-        deleted_lead = _delete_lead(lead_id)
-        logger.info(f"{deleted_lead}")
+        deleted_lead = async_client.run(_delete_lead_async(lead_id))
+        logger.info("%s", deleted_lead)
 
         delete_lead_status_code = deleted_lead[0]
         delete_lead_message = deleted_lead[1]["id"].get("message")
 
         if delete_lead_status_code == 422:
-            logger.info(f"User was not deleted")
+            logger.info("User was not deleted")
             return jsonify({"message": delete_lead_message, "contact": None}), 422
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while deleting lead\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while deleting lead\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while deleting lead\n%s\n%s", e, error_msg)
         return jsonify({"message": f"Error: {e}", "contact": None}), 400
-    logger.info(f"User was deleted")
+    logger.info("User was deleted")
     return jsonify({"message": delete_lead_message, "contact": True}), 200
     # end delete lead block ______________________________
 
@@ -161,31 +316,39 @@ def add_followers_to_lead(lead_id):
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received followers request {request.json}")
+    logger.info("Received followers request %s", request.json)
     # end auth block _____________________________________________
 
     # add followers to lead block ____________________________________________
     try:
         validated_data = followers_schema.load(request.json)
-        followers = add_followers(lead_id, validated_data)
-        logger.info(f"{followers}")
+        followers = async_client.run(add_followers_async(lead_id, validated_data))
+        logger.info("%s", followers)
+        changes = {"added": followers["added"], "removed": followers["removed"]}
         if followers.get("status_code") == 201:
-            logger.info(f"Followers was added")
-            return jsonify({"message": f"followers added successfully"}), 201
+            logger.info("Followers was added")
+            return jsonify({"message": f"followers added successfully", **changes}), 201
+        elif followers.get("status_code") == 200 and followers["removed"]:
+            logger.info("Followers was deleted")
+            return jsonify({"message": f"followers deleted successfully", **changes}), 200
         elif followers.get("status_code") == 200:
-            logger.info(f"Followers was deleted")
-            return jsonify({"message": f"followers deleted successfully"}), 200
+            logger.info("Followers are already up to date")
+            return jsonify({"message": f"followers are already up to date", **changes}), 200
 
     except ValidationError as err:
         send_slack_notification("Validation Error while adding followers\n" + str(err))
-        logger.error("Validation Error while adding followers\n" + str(err))
+        logger.error("Validation Error while adding followers\n%s", err)
         return jsonify({"message": f"Validation error while adding followers {err.messages}"}), 406
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while adding followers to lead\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while adding followers lead\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while adding followers lead\n%s\n%s", e, error_msg)
         return jsonify({"message": f"Error: {e}"}), 400
-    logger.info(f"followers weren't added")
+    logger.info("followers weren't added")
     return jsonify({"message": f"Something went wrong, followers weren't added"}), 202
     # end of followers to lead block ______________________________
 
@@ -195,18 +358,22 @@ def get_lead_by_email():
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received payload for lead lookup {request.json}")
+    logger.info("Received payload for lead lookup %s", request.json)
     try:
         validated_data = get_lead_by_email_schema.load(request.json)
         lead_email = validated_data.get("email")
-        lead = _get_lead_by_email(lead_email)
+        lead = async_client.run(_get_lead_by_email_async(lead_email))
     except ValidationError as err:
         send_slack_notification("Validation Error while getting lead\n" + str(err))
-        logger.error("Validation Error while getting lead\n" + str(err))
+        logger.error("Validation Error while getting lead\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "contact": None}), 406
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:
         send_slack_notification("Error while getting lead\n" + str(e))
-        logger.error("Error while getting lead\n" + str(e))
+        logger.error("Error while getting lead\n%s", e)
         return jsonify({"message": f"Error while getting lead {e}", "contact": None}), 400
     if not lead:
         return jsonify({"message": f"There is no such contact with email = {lead_email}", "contact": None}), 202
@@ -218,16 +385,20 @@ def get_lead_by_id(lead_id):
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received get lead by id request. Lead id is {lead_id}")
+    logger.info("Received get lead by id request. Lead id is %s", lead_id)
     try:
-        lead = _get_lead_by_id(lead_id)
+        lead = async_client.run(_get_lead_by_id_async(lead_id))
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:
         send_slack_notification("Error while getting lead by id\n" + str(e))
-        logger.error("Error while getting lead by id\n" + str(e))
+        logger.error("Error while getting lead by id\n%s", e)
         return jsonify({"message": f"Error while getting lead by id {e}", "contact": None}), 400
     if lead is False:
         return jsonify({"message": f"There is no such contact with id = {lead_id}", "contact": None}), 202
-    return jsonify({"message": "Successfully get lead by id", "contact": lead}), 200
+    return _conditional_json({"message": "Successfully get lead by id", "contact": lead}, last_modified=lead.get("dateUpdated"))
 
 
 @app.route('/get_user', methods=['POST'])
@@ -235,17 +406,17 @@ def get_user_by_email():
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received payload for user lookup {request.json}")
+    logger.info("Received payload for user lookup %s", request.json)
     try:
         lookup_email = request.json.get("email")
         team_member = _get_user_by_email(lookup_email)
     except ValidationError as err:
         send_slack_notification("Validation Error while getting user\n" + str(err))
-        logger.error("Validation Error while getting lead\n" + str(err))
+        logger.error("Validation Error while getting lead\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "user": None}), 406
     except Exception as e:
         send_slack_notification("Error while getting user\n" + str(e))
-        logger.error("Error while getting a user\n" + str(e))
+        logger.error("Error while getting a user\n%s", e)
         return jsonify({"message": f"Error while getting a user {e}", "user": None}), 400
     if team_member is False:
         return jsonify({"message": f"There is no such user with email = {lookup_email}", "user": None}), 202
@@ -257,16 +428,16 @@ def get_user_by_id(lead_id):
     provided_key = request.headers.get("X-API-KEY")
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received request to get user by id")
+    logger.info("Received request to get user by id")
     try:
         team_member = _get_user_by_id(lead_id)
     except Exception as e:
         send_slack_notification("Error while getting user by id\n" + str(e))
-        logger.error("Error while getting a user by id\n" + str(e))
+        logger.error("Error while getting a user by id\n%s", e)
         return jsonify({"message": f"Error while getting a user by id{e}", "user": None}), 400
     if team_member is False:
         return jsonify({"message": f"There is no such user with id = {lead_id}", "user": None}), 202
-    return jsonify({"message": "Successfully get user by id", "user": team_member}), 200
+    return _conditional_json({"message": "Successfully get user by id", "user": team_member})
 
 
 @app.route('/users', methods=['GET'])
@@ -278,11 +449,21 @@ def get_users_list():
         agents_list = _get_users_list()
     except Exception as e:
         send_slack_notification("Error while getting lead\n" + str(e))
-        logger.error("Error while getting a user\n" + str(e))
+        logger.error("Error while getting a user\n%s", e)
         return jsonify({"message": f"Error while getting a users list {e}", "users": None}), 400
     if agents_list is False:
         return jsonify({"message": f"There is no users currently in this location", "users": None}), 202
-    return jsonify({"message": "Successfully get users list", "users": agents_list}), 200
+    return _conditional_json({"message": "Successfully get users list", "users": agents_list})
+
+
+@app.route('/users/refresh', methods=['POST'])
+def refresh_users_list():
+    provided_key = request.headers.get("X-API-KEY")
+    if provided_key != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    logger.info("Received request to refresh users directory")
+    users_directory.invalidate()
+    return jsonify({"message": "Users list refresh scheduled"}), 202
 
 
 @app.route('/lead/<string:lead_id>/tags', methods=['PATCH'])
@@ -291,22 +472,26 @@ def add_tag_to_lead(lead_id):
 
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received tags payload:\n{request.json}")
+    logger.info("Received tags payload:\n%s", request.json)
 
     try:
         validated_data = tags_validation.load(request.json)
-        lead = add_tags(ghl_id=lead_id, tags_to_add=validated_data)
+        lead = async_client.run(add_tags_async(ghl_id=lead_id, tags_to_add=validated_data))
         logger.info("Tags added successfully")
 
     except ValidationError as err:
         send_slack_notification("Validation Error while adding tags\n" + str(err))
-        logger.error("Validation Error while adding tags\n" + str(err))
+        logger.error("Validation Error while adding tags\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "user": None}), 406
 
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, contact=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, contact=None)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while adding tags\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while adding tags\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while adding tags\n%s\n%s", e, error_msg)
         return jsonify({"message": f"Error: {e}", "contact": None}), 400
 
     return jsonify({"message": "Tags added successfully", "contact": lead}), 201
@@ -318,23 +503,31 @@ def add_notes_to_lead(lead_id):
 
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received notes payload:\n{request.json}")
+    logger.info("Received notes payload:\n%s", request.json)
 
     try:
         validated_data = notes_validation.load(request.json)
-        note = create_lead_property_inquiry(ghl_id=lead_id, data=validated_data)
-        logger.info("Note added successfully")
-        return jsonify({"note": note, "message": "Note added successfully"}), 201
+
+        def add_note():
+            note = async_client.run(create_lead_property_inquiry_async(ghl_id=lead_id, data=validated_data))
+            logger.info("Note added successfully")
+            return {"note": note, "message": "Note added successfully"}, 201, {}
+
+        return _idempotent(validated_data, add_note)
 
     except ValidationError as err:
         send_slack_notification("Validation Error while adding notes\n" + str(err))
-        logger.error("Validation Error while adding notes\n" + str(err))
+        logger.error("Validation Error while adding notes\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "note": None}), 406
 
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, note=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, note=None)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while adding tags\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while adding tags\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while adding tags\n%s\n%s", e, error_msg)
         return jsonify({"message": f"error: {e}", "note": None}), 400
 
 
@@ -345,24 +538,31 @@ def create_task_endpoint(lead_id):
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
 
-    logger.info(f"Received task payload:\n{request.json}")
+    logger.info("Received task payload:\n%s", request.json)
     try:
         validated_data = task_validation.load(request.json)
-        lead_task = create_task(lead_id, validated_data)
+
+        def add_task():
+            lead_task = async_client.run(create_task_async(lead_id, validated_data))
+            return {"task": lead_task, "message": "Task added successfully"}, 200, {}
+
+        return _idempotent(validated_data, add_task)
 
     except ValidationError as err:
         send_slack_notification("Validation Error while adding task\n" + str(err))
-        logger.error("Validation Error while adding task\n" + str(err))
+        logger.error("Validation Error while adding task\n%s", err)
         return jsonify({"message": f"Validation error {err.messages}", "task": None}), 406
 
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e, task=None)
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        return _rate_limited(e, task=None)
     except Exception as e:
         error_msg = traceback.format_exc()
         send_slack_notification("Error while adding task\n" + str(e) + "\n" + str(error_msg))
-        logger.error("Error while adding task\n" + str(e) + "\n" + str(error_msg))
+        logger.error("Error while adding task\n%s\n%s", e, error_msg)
         return jsonify({"message": f"error: {e}", "task": None}), 400
 
-    return jsonify({"task": lead_task, "message": "Task added successfully"}), 200
-
 
 @app.route('/ponds', methods=['GET'])
 def get_ponds_value():
@@ -370,14 +570,22 @@ def get_ponds_value():
 
     if provided_key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    logger.info(f"Received request to get ponds")
+    logger.info("Received request to get ponds")
 
-    ponds = get_ponds()
-    if ponds.get("ponds"):
-        return jsonify({"message": "Successfully retrieve ponds", "ponds": ponds.get("ponds")}), 200
+    # Served from the ponds cache, whose snapshots carry their own ETag
+    try:
+        ponds, etag = ponds_cache.snapshot()
+    except RuntimeError as e:
+        logger.error("%s", e)
+        ponds, etag = None, None
+    if ponds:
+        return _conditional_json({"message": "Successfully retrieve ponds", "ponds": ponds}, etag=etag)
     return jsonify({"message": "Somthing went wrong", "ponds": None}), 202
 
 
 if __name__ == '__main__':
-    logger.info("Starting app")
-    app.run()
+    # This process has already imported the app as __main__ and started its job workers; serve.py must start
+    # clean so the metrics directory is set before anything imports prometheus_client, and the workers it
+    # forks import the app themselves
+    serve_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    os.execv(sys.executable, [sys.executable, serve_py])
@@ -0,0 +1,59 @@
+"""Custom-field mapping cost per lead: compiled transforms vs walking the field table.
+
+Run from the repository root: python -m benchmarks.custom_fields_benchmark
+"""
+import timeit
+
+from benchmarks.payloads import FB4S_LEAD, fb4s_leads
+from utils.custom_fields import (
+    CUSTOM_FIELDS,
+    EMPTY_VALUES,
+    OMIT,
+    build_custom_fields,
+    build_custom_fields_batch,
+    build_filled_custom_fields,
+)
+
+BATCH_SIZE = 1000
+
+
+def walk_table(person, property_data=None, skip_empty=False):
+    # What an uncompiled, table-driven mapping does on every call
+    sources = {"person": person, "property": property_data or {}}
+    result = {}
+    for field_id, source, key, default in CUSTOM_FIELDS:
+        value = sources[source].get(key, default)
+        if value is OMIT or skip_empty and value in EMPTY_VALUES:
+            continue
+        result[field_id] = value
+    return result
+
+
+def report(name, stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5)) / number
+    print(f"{name:<40} {best * 1e6:9.2f} us")
+    return best
+
+
+def main():
+    person, property_data = FB4S_LEAD["person"], FB4S_LEAD["property"]
+    assert walk_table(person, property_data) == build_custom_fields(person, property_data)
+    assert walk_table(person, skip_empty=True) == build_filled_custom_fields(person)
+
+    print("per lead")
+    walked = report("create, table walk", lambda: walk_table(person, property_data), 20000)
+    compiled = report("create, compiled", lambda: build_custom_fields(person, property_data), 20000)
+    print(f"{'':<40} {walked / compiled:9.1f}x")
+    walked = report("update, table walk", lambda: walk_table(person, skip_empty=True), 20000)
+    compiled = report("update, compiled", lambda: build_filled_custom_fields(person), 20000)
+    print(f"{'':<40} {walked / compiled:9.1f}x")
+
+    leads = fb4s_leads(BATCH_SIZE)
+    print(f"batch of {BATCH_SIZE}")
+    report("create, table walk", lambda: [walk_table(lead["person"], lead["property"]) for lead in leads], 20)
+    report("create, compiled batch", lambda: build_custom_fields_batch(leads), 20)
+    report("update, compiled batch", lambda: build_custom_fields_batch(leads, skip_empty=True), 20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import copy
+
+# A typical FB4S property inquiry as POST /lead receives it
+FB4S_LEAD = {
+    "type": "Property Inquiry",
+    "source": "FB4S",
+    "system": "fb4s.com",
+    "description": "Buyer asked about the listing from the property page",
+    "message": "Hi, is this property still available? I would like to book a showing this weekend.",
+    "person": {
+        "id": 184223,
+        "firstName": "Jordan",
+        "lastName": "Smith",
+        "emails": [{"value": "jordan.smith@example.com"}],
+        "phones": [{"value": "+14165550123"}],
+        "addresses": [{"city": "Toronto", "state": "ON"}],
+        "tags": ["fb4s", "buyer", "property inquiry"],
+        "customMLSNumber": "W5912345",
+        "customListingType": "Residential",
+        "customAddress": "12 King St W",
+        "customCity": "Toronto",
+        "customProvince": "ON",
+        "customFB4SLeadID": "184223",
+        "customFB4SRCAURL": "https://fb4s.com/rca/184223",
+        "customListingURLPath": "https://fb4s.com/listing/w5912345",
+        "customParentCategory": "Buyer",
+        "customChromeExtensionLink": "https://fb4s.com/ext/184223",
+        "customFB4SInquiriesCounter": 3,
+        "customBuyerProfileFB4S": "https://fb4s.com/profile/184223",
+        "customAssignedNotFromWillowAt": "2025-03-01",
+        "customStage": "Lead",
+        "customPrice": "899000",
+        "customClosingAnniversary": "",
+        "customYlopoSellerReport": "N/A",
+        "customWhoareyou": "Buyer",
+        "customLastActivity": "2025-03-14",
+        "customCloseDate": "",
+        "customLisitngPushesSent": "4",
+        "customYlopoStarsLink": "N/A",
+        "customOldID": "",
+    },
+    "property": {
+        "street": "12 King St W",
+        "city": "Toronto",
+        "state": "ON",
+        "code": "M5H 1A1",
+        "mlsNumber": "W5912345",
+        "url": "https://fb4s.com/listing/w5912345",
+        "price": 899000,
+    },
+}
+
+
+def fb4s_leads(count: int) -> list:
+    """``count`` distinct copies of FB4S_LEAD, as a bulk import would carry them."""
+    leads = []
+    for number in range(count):
+        lead = copy.deepcopy(FB4S_LEAD)
+        lead["person"]["emails"][0]["value"] = f"buyer{number}@example.com"
+        lead["person"]["customFB4SLeadID"] = str(100000 + number)
+        leads.append(lead)
+    return leads
@@ -0,0 +1,59 @@
+"""Per-request validation cost of the write routes: marshmallow alone vs the precompiled fast path.
+
+Run from the repository root: python -m benchmarks.validation_benchmark
+"""
+import timeit
+
+from marshmallow import ValidationError
+
+from benchmarks.payloads import FB4S_LEAD
+from validation.add_tags_validation import tags_validation
+from validation.create_lead_validation import post_lead_schema
+from validation.followers_validation import followers_schema
+from validation.notes_validation import notes_validation
+from validation.task_validation import task_validation
+from validation.update_lead_validation import update_lead_schema
+
+UPDATE_PAYLOAD = {"person": {k: v for k, v in FB4S_LEAD["person"].items() if k not in ("id", "customFB4SInquiriesCounter")}}
+NOTES_PAYLOAD = {k: v for k, v in FB4S_LEAD.items() if k != "person"}
+
+ROUTES = (
+    ("POST /lead", post_lead_schema, FB4S_LEAD),
+    ("PUT /lead/<id>", update_lead_schema, UPDATE_PAYLOAD),
+    ("POST /lead/<id>/notes", notes_validation, NOTES_PAYLOAD),
+    ("POST /lead/<id>/tasks", task_validation, {"title": "Call back", "dueDate": "2025-03-15T11:00:00Z", "description": "Showing"}),
+    ("POST /lead/<id>/followers", followers_schema, {"followers": ["Fo7TmuqqwHIM22eno39t", "9pXq0rOQJOUWOxDmnMHP"]}),
+    ("PATCH /lead/<id>/tags", tags_validation, {"tags": ["fb4s", "buyer"]}),
+)
+
+
+def best_time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def errors(load, payload):
+    try:
+        load(payload)
+    except ValidationError as err:
+        return err.messages
+    return None
+
+
+def main():
+    print(f"{'route':<28} {'marshmallow':>12} {'fast path':>12} {'speedup':>8}")
+    for route, fast_schema, payload in ROUTES:
+        assert fast_schema.load(payload) == fast_schema.schema.load(payload)
+        slow = best_time(lambda: fast_schema.schema.load(payload), 2000)
+        fast = best_time(lambda: fast_schema.load(payload), 2000)
+        print(f"{route:<28} {slow * 1e6:10.1f}us {fast * 1e6:10.1f}us {slow / fast:7.1f}x")
+
+    # Invalid payloads take the fallback: the fast path gives up and marshmallow reports the errors
+    invalid = {**FB4S_LEAD, "person": {**FB4S_LEAD["person"], "emails": [{"value": "not-an-email"}]}}
+    assert errors(post_lead_schema.load, invalid) == errors(post_lead_schema.schema.load, invalid)
+    slow = best_time(lambda: errors(post_lead_schema.schema.load, invalid), 2000)
+    fast = best_time(lambda: errors(post_lead_schema.load, invalid), 2000)
+    print(f"{'POST /lead (invalid)':<28} {slow * 1e6:10.1f}us {fast * 1e6:10.1f}us {slow / fast:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,148 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
 
-import requests
+from dotenv import load_dotenv
+
+from utils import http_client, metrics
+
+load_dotenv()
+
+logger = logging.getLogger()
 
 RETOOL_URL_FOR_SQL = os.getenv("RETOOL_URL_FOR_SQL")
 
+# How often the background thread asks Retool for new or changed ponds
+PONDS_REFRESH_INTERVAL = int(os.getenv("PONDS_REFRESH_INTERVAL", "60"))
+# Incremental syncs can't see deleted rows, so the whole table is reloaded this often
+PONDS_FULL_REFRESH_INTERVAL = int(os.getenv("PONDS_FULL_REFRESH_INTERVAL", "3600"))
+# Optional column bumped whenever a pond row changes; without it only rows with a higher id are picked up
+PONDS_UPDATED_AT_COLUMN = os.getenv("PONDS_UPDATED_AT_COLUMN", "")
+PONDS_QUERY_TIMEOUT = float(os.getenv("PONDS_QUERY_TIMEOUT", "15"))
+
+PONDS_TABLE = "fb4s_pond.pond_values"
+
+
+def _sql_literal(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _id_order(value):
+    # Retool may hand ids back as strings; "10" must still sort after "9"
+    try:
+        return 0, int(value)
+    except (TypeError, ValueError):
+        return 1, str(value)
+
+
+def _etag(ponds: list) -> str:
+    return hashlib.sha256(json.dumps(ponds, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _query_ponds(query: str):
+    response = http_client.post(
+        RETOOL_URL_FOR_SQL, json={"query": query}, timeout=(http_client.CONNECT_TIMEOUT, PONDS_QUERY_TIMEOUT)
+    )
+    response.raise_for_status()
+    return response.json().get("ponds")
+
+
+class PondsCache:
+    """Last good copy of the ponds table, kept current by a daemon thread.
+
+    Regular syncs only fetch rows with an id above the highest one seen (or changed since the last sync
+    when ``PONDS_UPDATED_AT_COLUMN`` is set) and merge them in; a full reload runs every
+    ``full_refresh_interval``. A failed sync keeps serving the previous snapshot.
+    """
+
+    def __init__(self, interval: int = PONDS_REFRESH_INTERVAL, full_refresh_interval: int = PONDS_FULL_REFRESH_INTERVAL,
+                 updated_at_column: str = PONDS_UPDATED_AT_COLUMN):
+        self.interval = interval
+        self.full_refresh_interval = full_refresh_interval
+        self.updated_at_column = updated_at_column
+        # (ponds, etag) is swapped as a whole
+        self._snapshot = None
+        self._last_id = None
+        self._last_updated_at = None
+        self._last_full_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refresher = None
+
+    def _incremental_query(self) -> str:
+        conditions = [f"id > {_sql_literal(self._last_id)}"]
+        if self.updated_at_column and self._last_updated_at is not None:
+            conditions.append(f"{self.updated_at_column} > {_sql_literal(self._last_updated_at)}")
+        return f"SELECT * FROM {PONDS_TABLE} WHERE {' OR '.join(conditions)} ORDER BY id ASC"
+
+    def _can_merge(self, rows) -> bool:
+        return isinstance(rows, list) and all(isinstance(row, dict) and "id" in row for row in rows)
+
+    def refresh(self, full: bool = False) -> bool:
+        with self._refresh_lock:
+            full = full or self._snapshot is None or self._last_id is None or (
+                time.monotonic() - self._last_full_refresh >= self.full_refresh_interval
+            )
+            query = f"SELECT * FROM {PONDS_TABLE} ORDER BY id ASC" if full else self._incremental_query()
+            try:
+                rows = _query_ponds(query)
+            except Exception:
+                cached = len(self._snapshot[0]) if self._snapshot else 0
+                logger.exception("Ponds refresh failed, serving %d cached ponds", cached)
+                return False
+            if rows is None:
+                logger.error("Ponds refresh returned no ponds, serving the cached copy")
+                return False
+
+            if full:
+                ponds = rows
+                self._last_full_refresh = time.monotonic()
+            elif not rows:
+                return True
+            else:
+                by_id = {pond["id"]: pond for pond in self._snapshot[0]}
+                by_id.update((row["id"], row) for row in rows)
+                ponds = sorted(by_id.values(), key=lambda pond: _id_order(pond["id"]))
+
+            if self._can_merge(ponds) and ponds:
+                self._last_id = max((pond["id"] for pond in ponds), key=_id_order)
+                if self.updated_at_column:
+                    values = [pond.get(self.updated_at_column) for pond in ponds]
+                    self._last_updated_at = max((value for value in values if value is not None), default=None)
+            else:
+                # Rows without ids can only be replaced by full reloads
+                self._last_id = None
+            self._snapshot = (ponds, _etag(ponds))
+            logger.info("Ponds %s refresh: %d row(s) fetched, %d cached", "full" if full else "incremental", len(rows), len(ponds))
+            return True
+
+    def _run_refresher(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+    def _ensure_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._start_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run_refresher, name="ponds-cache", daemon=True)
+                self._refresher.start()
+
+    def snapshot(self):
+        """Return ``(ponds, etag)``, loading the table on first use."""
+        metrics.cache_lookup("ponds", self._snapshot is not None)
+        if self._snapshot is None:
+            self.refresh()
+            if self._snapshot is None:
+                raise RuntimeError("Ponds are unavailable and there is no cached copy")
+        self._ensure_refresher()
+        return self._snapshot
+
 
-def get_ponds():
-    query = """SELECT * FROM fb4s_pond.pond_values
-            ORDER BY id ASC """
-    response = requests.post(RETOOL_URL_FOR_SQL, json={"query": query})
-    return response.json()
+ponds_cache = PondsCache()
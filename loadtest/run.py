@@ -0,0 +1,341 @@
+"""Drive every route of the app and report throughput and p50/p95/p99 latency per route.
+
+Against the bundled stand-in (the app is started with serve.py and pointed at it):
+
+    python -m loadtest.run --spawn --duration 30 --concurrency 64 --latency-ms 80 --rate-limit-rate 0.01
+
+Against an app that is already running (started with the environment `python -m loadtest.stub_upstreams` prints):
+
+    python -m loadtest.run --base-url http://127.0.0.1:5007 --api-key <FLASK_API_KEY>
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+
+import requests
+
+from loadtest.stub_upstreams import SEED_CONTACTS, SEED_USERS, StubServer, add_fault_arguments, app_environment, faults_from_args
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _lead_payload(email: str) -> dict:
+    return {
+        "source": "FB4S",
+        "type": "Property Inquiry",
+        "message": "Is this property still available?",
+        "description": "Load test inquiry",
+        "person": {
+            "firstName": "Load",
+            "lastName": "Test",
+            "emails": [{"value": email}],
+            "phones": [{"value": "+14165550123"}],
+            "addresses": [{"city": "Toronto", "state": "ON"}],
+            "tags": ["fb4s", "loadtest"],
+            "customMLSNumber": "W5912345",
+            "customCity": "Toronto",
+            "customProvince": "ON",
+        },
+        "property": {
+            "street": "12 King St W",
+            "city": "Toronto",
+            "state": "ON",
+            "code": "M5H 1A1",
+            "mlsNumber": "W5912345",
+            "url": "https://fb4s.com/listing/w5912345",
+            "price": 899000,
+        },
+    }
+
+
+def _contact_id() -> str:
+    return f"contact-{random.randrange(SEED_CONTACTS)}"
+
+
+class Scenarios:
+    """One request builder per route; each returns (method, path, request kwargs)."""
+
+    def __init__(self):
+        self.job_ids = deque(maxlen=1000)
+        self.builders = {
+            "GET /health": lambda: ("GET", "/health", {}),
+            "GET /": lambda: ("GET", "/", {}),
+            "POST /lead": self.create_lead,
+            "POST /lead?async=true": self.create_lead_async,
+            "GET /jobs/<id>": self.job_status,
+            "POST /leads/bulk": self.bulk_create,
+            "PUT /lead/<id>": self.update_lead,
+            "DELETE /lead/<id>": lambda: ("DELETE", f"/lead/{_contact_id()}", {}),
+            "POST /lead/<id>/followers": self.followers,
+            "POST /get_lead": self.lead_by_email,
+            "GET /get_lead/<id>": lambda: ("GET", f"/get_lead/{_contact_id()}", {}),
+            "POST /get_user": self.user_by_email,
+            "GET /get_user/<id>": lambda: ("GET", f"/get_user/user-{random.randrange(SEED_USERS)}", {}),
+            "GET /users": lambda: ("GET", "/users", {}),
+            "POST /users/refresh": lambda: ("POST", "/users/refresh", {}),
+            "PATCH /lead/<id>/tags": self.tags,
+            "POST /lead/<id>/notes": self.note,
+            "POST /lead/<id>/tasks": self.task,
+            "GET /ponds": lambda: ("GET", "/ponds", {}),
+        }
+
+    def build(self, route: str):
+        return self.builders[route]()
+
+    def create_lead(self):
+        return "POST", "/lead", {"json": _lead_payload(f"new-{uuid.uuid4().hex}@example.com")}
+
+    def create_lead_async(self):
+        return "POST", "/lead?async=true", {"json": _lead_payload(f"new-{uuid.uuid4().hex}@example.com")}
+
+    def job_status(self):
+        job_id = random.choice(self.job_ids) if self.job_ids else "missing"
+        return "GET", f"/jobs/{job_id}", {}
+
+    def bulk_create(self):
+        lines = [json.dumps(_lead_payload(f"bulk-{uuid.uuid4().hex}@example.com")) for _ in range(5)]
+        return "POST", "/leads/bulk", {"data": "\n".join(lines), "headers": {"Content-Type": "application/x-ndjson"}}
+
+    def update_lead(self):
+        return "PUT", f"/lead/{_contact_id()}", {"json": {"person": {"firstName": "Updated", "customStage": "Lead"}}}
+
+    def followers(self):
+        followers = random.sample([f"user-{n}" for n in range(SEED_USERS)], 2)
+        return "POST", f"/lead/{_contact_id()}/followers", {"json": {"followers": followers}}
+
+    def lead_by_email(self):
+        return "POST", "/get_lead", {"json": {"email": f"lead{random.randrange(SEED_CONTACTS)}@example.com"}}
+
+    def user_by_email(self):
+        return "POST", "/get_user", {"json": {"email": f"realtor{random.randrange(SEED_USERS)}@example.com"}}
+
+    def tags(self):
+        return "PATCH", f"/lead/{_contact_id()}/tags", {"json": {"tags": [f"tag-{random.randrange(20)}"]}}
+
+    def note(self):
+        payload = {key: value for key, value in _lead_payload("unused@example.com").items() if key != "person"}
+        return "POST", f"/lead/{_contact_id()}/notes", {"json": payload}
+
+    def task(self):
+        task = {"title": "Call back", "dueDate": "2025-03-15T11:00:00Z", "description": "Load test task"}
+        return "POST", f"/lead/{_contact_id()}/tasks", {"json": task}
+
+
+# Every route in app.py with its share of the traffic; /jobs/<id> polls jobs queued by the async POSTs
+ROUTES = {
+    "GET /health": 1,
+    "GET /": 1,
+    "POST /lead": 6,
+    "POST /lead?async=true": 2,
+    "GET /jobs/<id>": 2,
+    "POST /leads/bulk": 1,
+    "PUT /lead/<id>": 4,
+    "DELETE /lead/<id>": 1,
+    "POST /lead/<id>/followers": 2,
+    "POST /get_lead": 4,
+    "GET /get_lead/<id>": 6,
+    "POST /get_user": 2,
+    "GET /get_user/<id>": 2,
+    "GET /users": 2,
+    "POST /users/refresh": 1,
+    "PATCH /lead/<id>/tags": 4,
+    "POST /lead/<id>/notes": 4,
+    "POST /lead/<id>/tasks": 4,
+    "GET /ponds": 4,
+}
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, seconds: float, status):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+
+def percentile(sorted_values: list, share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(share * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _worker(base_url: str, api_key: str, routes: list, weights: list, deadline: float, scenarios: Scenarios,
+            results: Results, timeout: float):
+    session = requests.Session()
+    session.headers["X-API-KEY"] = api_key
+    while time.monotonic() < deadline:
+        route = random.choices(routes, weights)[0]
+        method, path, kwargs = scenarios.build(route)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=timeout, **kwargs)
+            response.content  # streamed bodies (bulk) count until the last byte
+            status = response.status_code
+            if route == "POST /lead?async=true" and status == 202:
+                scenarios.job_ids.append(response.json()["job_id"])
+        except requests.RequestException as e:
+            status = type(e).__name__
+        results.record(route, time.perf_counter() - started, status)
+
+
+def run_load(base_url: str, api_key: str, duration: float, concurrency: int, routes: dict, timeout: float) -> dict:
+    scenarios = Scenarios()
+    results = Results()
+    names, weights = list(routes), list(routes.values())
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=_worker, args=(base_url, api_key, names, weights, deadline, scenarios, results, timeout), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    report = {"duration": elapsed, "concurrency": concurrency, "routes": {}}
+    for route in names:
+        latencies = sorted(results.latencies.get(route, []))
+        statuses = dict(results.statuses.get(route, {}))
+        errors = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500)
+        report["routes"][route] = {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0) * 1000,
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        }
+    total = sum(route["requests"] for route in report["routes"].values())
+    report["requests"] = total
+    report["rps"] = total / elapsed
+    return report
+
+
+def print_report(report: dict):
+    header = f"{'route':<28} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'5xx/exc':>7}  statuses"
+    print(header)
+    print("-" * len(header))
+    for route, stats in report["routes"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        print(f"{route:<28} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+              f"{stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f} {stats['errors']:>7}  {statuses}")
+    print("-" * len(header))
+    print(f"{'total':<28} {report['requests']:>7} {report['rps']:>8.1f}   "
+          f"{report['concurrency']} clients for {report['duration']:.1f}s")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, process, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode} before becoming healthy")
+        try:
+            if requests.get(base_url + "/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The app did not become healthy within {timeout:.0f}s")
+
+
+def spawn_app(stub_url: str, api_key: str, args, workdir: str):
+    # Every SQLite store the app opens lives in workdir, so a run neither reads nor leaves state under data/
+    port = _free_port()
+    env = {
+        **os.environ,
+        **app_environment(stub_url),
+        "FLASK_API_KEY": api_key,
+        "GHL_API_KEY": "loadtest",
+        "SERVER_BIND": f"127.0.0.1:{port}",
+        "SERVER_WORKER_MODEL": args.worker_model,
+        "SERVER_WORKERS": str(args.workers),
+        "SERVER_THREADS": str(args.threads),
+        "GHL_RATE_LIMIT_PER_SEC": str(args.ghl_rate_limit),
+        "RATE_LIMIT_DB_PATH": os.path.join(workdir, "rate_limit.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "CONTACT_MIRROR_DB_PATH": os.path.join(workdir, "contacts.sqlite3"),
+        "IDEMPOTENCY_DB_PATH": os.path.join(workdir, "idempotency.sqlite3"),
+    }
+    log = open(os.path.join(workdir, "app.out"), "wb")
+    process = subprocess.Popen([sys.executable, "serve.py"], cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}", log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:5007", help="app to load when not using --spawn")
+    parser.add_argument("--api-key", default=os.getenv("FLASK_API_KEY", "loadtest"))
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients sending requests back to back")
+    parser.add_argument("--timeout", type=float, default=60, help="client timeout per request")
+    parser.add_argument("--routes", nargs="*", help="only these routes, e.g. 'POST /lead' 'GET /ponds'")
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this file")
+    spawn = parser.add_argument_group("--spawn: start the stand-in and the app (serve.py) locally")
+    spawn.add_argument("--spawn", action="store_true")
+    spawn.add_argument("--worker-model", default="threaded", choices=("threaded", "process"))
+    spawn.add_argument("--workers", type=int, default=2)
+    spawn.add_argument("--threads", type=int, default=32)
+    spawn.add_argument("--ghl-rate-limit", type=float, default=0, help="GHL_RATE_LIMIT_PER_SEC for the app, 0 = off")
+    add_fault_arguments(spawn)
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        unknown = set(args.routes) - set(ROUTES)
+        if unknown:
+            parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+        routes = {route: ROUTES[route] for route in args.routes}
+
+    if not args.spawn:
+        report = run_load(args.base_url.rstrip("/"), args.api_key, args.duration, args.concurrency, routes, args.timeout)
+    else:
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+            stub = StubServer(faults=faults_from_args(args)).start()
+            process, base_url, log = spawn_app(stub.url, args.api_key, args, workdir)
+            try:
+                _wait_healthy(base_url, process)
+                report = run_load(base_url, args.api_key, args.duration, args.concurrency, routes, args.timeout)
+                report["upstream_calls"] = requests.get(stub.url + "/__stub__/stats", timeout=5).json()
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                log.close()
+                stub.stop()
+
+    print_report(report)
+    if "upstream_calls" in report:
+        print("upstream calls:", ", ".join(f"{name}={count}" for name, count in sorted(report["upstream_calls"].items())))
+    if args.json_path:
+        with open(args.json_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
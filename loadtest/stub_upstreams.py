@@ -0,0 +1,311 @@
+"""Local stand-in for every upstream the app calls: GHL v1, the Make 2.0 proxy, Retool, auto-assign and Slack.
+
+Contacts, users and ponds live in memory. Latency, errors and 429s can be injected per upstream, from the
+command line or at runtime through PATCH /__stub__/config.
+
+    python -m loadtest.stub_upstreams --port 8099 --latency-ms 80 --error-rate 0.01 --rate-limit-rate 0.02
+
+prints the environment the app needs to talk to it.
+"""
+import argparse
+import ast
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+UPSTREAMS = ("ghl", "make", "retool", "auto_assign", "slack")
+SEED_CONTACTS = 1000
+SEED_USERS = 20
+SEED_PONDS = 50
+
+
+class Faults:
+    """Latency, error and 429 injection; ``overrides`` holds per-upstream values of the same keys."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_limit_rate: float = 0, retry_after: float = 1):
+        self.defaults = {
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "error_rate": error_rate,
+            "rate_limit_rate": rate_limit_rate,
+            "retry_after": retry_after,
+        }
+        self.overrides = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str) -> dict:
+        with self._lock:
+            return {**self.defaults, **self.overrides.get(upstream, {})}
+
+    def update(self, changes: dict):
+        with self._lock:
+            for key, value in changes.items():
+                if key in UPSTREAMS and isinstance(value, dict):
+                    self.overrides.setdefault(key, {}).update(
+                        {name: float(v) for name, v in value.items() if name in self.defaults}
+                    )
+                elif key in self.defaults:
+                    self.defaults[key] = float(value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {**self.defaults, "overrides": {k: dict(v) for k, v in self.overrides.items()}}
+
+
+class Store:
+    """In-memory GHL data. Any contact id is treated as existing, so load runs never run out of ids."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.users = [
+            {"id": f"user-{n}", "name": f"Realtor {n}", "firstName": "Realtor", "lastName": str(n),
+             "email": f"realtor{n}@example.com"}
+            for n in range(SEED_USERS)
+        ]
+        self.contacts = {}
+        self.by_email = {}
+        self.ponds = [{"id": n, "pond_name": f"Pond {n}", "pond_value": f"pond-{n}"} for n in range(1, SEED_PONDS + 1)]
+        for n in range(SEED_CONTACTS):
+            self.save({"id": f"contact-{n}", "email": f"lead{n}@example.com", "firstName": "Lead", "lastName": str(n)})
+
+    def _new_contact(self, contact_id: str) -> dict:
+        user = self.users[hash(contact_id) % len(self.users)]
+        return {"id": contact_id, "email": None, "tags": [], "followers": [], "assignedTo": user["id"],
+                "dateUpdated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}
+
+    def save(self, fields: dict) -> dict:
+        with self._lock:
+            contact_id = fields.get("id") or uuid.uuid4().hex[:20]
+            contact = self.contacts.get(contact_id) or self._new_contact(contact_id)
+            contact.update({key: value for key, value in fields.items() if value is not None})
+            contact["dateUpdated"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+            self.contacts[contact_id] = contact
+            if contact.get("email"):
+                self.by_email[contact["email"].lower()] = contact_id
+            return dict(contact)
+
+    def get(self, contact_id: str) -> dict:
+        with self._lock:
+            contact = self.contacts.get(contact_id)
+        return dict(contact) if contact else self.save({"id": contact_id})
+
+    def find_email(self, email: str):
+        with self._lock:
+            contact_id = self.by_email.get((email or "").lower())
+            return dict(self.contacts[contact_id]) if contact_id else None
+
+    def delete(self, contact_id: str):
+        with self._lock:
+            contact = self.contacts.pop(contact_id, None)
+            if contact and contact.get("email"):
+                self.by_email.pop(contact["email"].lower(), None)
+
+    def change_followers(self, contact_id: str, action: str, followers: list):
+        contact = self.get(contact_id)
+        current = contact.get("followers") or []
+        if action == "add":
+            current = current + [follower for follower in followers if follower not in current]
+        else:
+            current = [follower for follower in current if follower not in followers]
+        self.save({"id": contact_id, "followers": current})
+
+
+def create_app(faults: Faults = None, store: Store = None) -> Flask:
+    app = Flask(__name__)
+    faults = faults or Faults()
+    store = store or Store()
+    calls = Counter()
+    calls_lock = threading.Lock()
+    app.config.update(FAULTS=faults, STORE=store)
+
+    def upstream_of(path: str):
+        for prefix, upstream in (("/ghl/", "ghl"), ("/make", "make"), ("/retool", "retool"),
+                                 ("/auto-assign", "auto_assign"), ("/slack/", "slack")):
+            if path.startswith(prefix):
+                return upstream
+        return None
+
+    @app.before_request
+    def inject_faults():
+        upstream = upstream_of(request.path)
+        if upstream is None:
+            return None
+        with calls_lock:
+            calls[upstream] += 1
+        config = faults.get(upstream)
+        delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+        if delay > 0:
+            time.sleep(delay / 1000)
+        roll = random.random()
+        if roll < config["rate_limit_rate"]:
+            with calls_lock:
+                calls[f"{upstream}:429"] += 1
+            return jsonify({"msg": "Too many requests"}), 429, {"Retry-After": str(config["retry_after"])}
+        if roll < config["rate_limit_rate"] + config["error_rate"]:
+            with calls_lock:
+                calls[f"{upstream}:500"] += 1
+            return jsonify({"msg": "Injected upstream error"}), 500
+        return None
+
+    @app.route("/__stub__/config", methods=["GET", "PATCH"])
+    def stub_config():
+        if request.method == "PATCH":
+            faults.update(request.get_json(force=True) or {})
+        return jsonify(faults.as_dict())
+
+    @app.route("/__stub__/stats", methods=["GET"])
+    def stub_stats():
+        with calls_lock:
+            return jsonify(dict(calls))
+
+    # GHL v1 _______________________________________________
+    @app.route("/ghl/", methods=["HEAD", "GET"])
+    def ghl_root():
+        return jsonify({})
+
+    @app.route("/ghl/users/", methods=["GET"])
+    def ghl_users():
+        return jsonify({"users": store.users})
+
+    @app.route("/ghl/contacts/lookup", methods=["GET"])
+    def ghl_lookup():
+        contact = store.find_email(request.args.get("email"))
+        return jsonify({"contacts": [contact] if contact else []})
+
+    @app.route("/ghl/contacts/", methods=["POST"])
+    def ghl_create_contact():
+        body = request.get_json(force=True)
+        return jsonify({"contact": store.save({key: value for key, value in body.items() if key != "id"})})
+
+    @app.route("/ghl/contacts/<contact_id>", methods=["GET", "PUT", "DELETE"])
+    def ghl_contact(contact_id):
+        if request.method == "DELETE":
+            store.delete(contact_id)
+            return jsonify({"succeded": True})
+        if request.method == "PUT":
+            return jsonify({"contact": store.save({**request.get_json(force=True), "id": contact_id})})
+        return jsonify({"contact": store.get(contact_id)})
+
+    @app.route("/ghl/contacts/<contact_id>/notes", methods=["POST"])
+    def ghl_note(contact_id):
+        body = request.get_json(force=True)
+        return jsonify({"id": uuid.uuid4().hex[:20], "contactId": contact_id, "body": body.get("body")})
+
+    @app.route("/ghl/contacts/<contact_id>/tasks", methods=["POST"])
+    def ghl_task(contact_id):
+        return jsonify({"id": uuid.uuid4().hex[:20], "contactId": contact_id, **request.get_json(force=True)})
+
+    # Make 2.0 proxy _______________________________________
+    @app.route("/make", methods=["GET", "POST"])
+    def make():
+        body = request.get_json(force=True) or {}
+        action = body.get("action")
+        if action == "get_by_id":
+            return jsonify({"contact": store.get(body.get("id"))})
+        if action == "get_by_email":
+            contact = store.find_email(body.get("email"))
+            return jsonify({"contacts": [contact] if contact else []})
+        match = re.match(r"^/contacts/([^/]+)(/followers)?$", body.get("url") or "")
+        if match and action == "get":
+            return jsonify({"contact": store.get(match.group(1))})
+        if match and match.group(2) and action in ("add", "delete"):
+            followers = ast.literal_eval(body.get("body") or "{}").get("followers", [])
+            store.change_followers(match.group(1), action, followers)
+            return jsonify({"status_code": 201 if action == "add" else 200})
+        return jsonify({"message": f"Unknown Make action {action!r}"}), 400
+
+    # Retool SQL ___________________________________________
+    @app.route("/retool", methods=["POST"])
+    def retool():
+        query = (request.get_json(force=True) or {}).get("query", "")
+        match = re.search(r"id\s*>\s*'?(\d+)", query)
+        last_id = int(match.group(1)) if match else None
+        return jsonify({"ponds": [pond for pond in store.ponds if last_id is None or pond["id"] > last_id]})
+
+    # Auto-assign and Slack ________________________________
+    @app.route("/auto-assign", methods=["POST"])
+    def auto_assign():
+        realtors = random.sample(store.users, 3)
+        return jsonify({"assigned_realtor": realtors[0]["email"], "possible_realtors": [r["email"] for r in realtors[1:]]})
+
+    @app.route("/slack/services/<path:hook>", methods=["POST"])
+    def slack(hook):
+        return "ok"
+
+    return app
+
+
+def app_environment(base_url: str) -> dict:
+    """Environment variables pointing the app at a stand-in served on ``base_url``."""
+    base_url = base_url.rstrip("/")
+    return {
+        "GHL_BASE_URL": f"{base_url}/ghl/",
+        "MAKE_GHL_2_0_AUTH_URL": f"{base_url}/make",
+        "RETOOL_URL_FOR_SQL": f"{base_url}/retool",
+        "AUTO_ASSIGN_URL": f"{base_url}/auto-assign",
+        "SLACK_BASE_URL": f"{base_url}/slack/services/",
+        "SLACK_WEBHOOK_URL": "loadtest",
+    }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    # Thousands of requests a second would bury everything else on the terminal
+    def log_request(self, code="-", size="-"):
+        pass
+
+
+class StubServer:
+    """Runs the stand-in on a background thread; port 0 picks a free port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Faults = None):
+        self.app = create_app(faults)
+        self._server = make_server(host, port, self.app, threaded=True, request_handler=_QuietRequestHandler)
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstreams", daemon=True)
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean added latency per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="latency varies uniformly by +/- this much")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of calls answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="share of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with a 429")
+
+
+def faults_from_args(args) -> Faults:
+    return Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.retry_after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, faults_from_args(args))
+    print("Point the app at the stand-in with:")
+    for name, value in app_environment(server.url).items():
+        print(f"{name}={value}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
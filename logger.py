@@ -1,18 +1,117 @@
+import atexit
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, plain rotation is enough
+    fcntl = None
 
 
 log_directory = "logs"
 if not os.path.exists(log_directory):
     os.makedirs(log_directory)
 
+# Longer messages (full request payloads, upstream responses) are cut to this many characters
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))
+# Records waiting for the listener thread; when full, new records are dropped instead of blocking requests
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
 
 class AjaxFilter(logging.Filter):
     def filter(self, record):
         return "health" not in record.getMessage()
 
 
+class TruncateFilter(logging.Filter):
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        # The same record goes through every handler, cut it only once
+        if getattr(record, "truncated", False):
+            return True
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}... [truncated {len(message) - self.max_chars} chars]"
+            record.args = None
+        record.truncated = True
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def prepare(self, record):
+        # Keep msg and args as they are: %-formatting happens on the listener thread, not in the request.
+        # Callers must not mutate objects passed as log arguments afterwards.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class MultiProcessTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """TimedRotatingFileHandler that several worker processes can share.
+
+    Writes and rollovers happen under an exclusive flock on ``<file>.lock``; a process that finds the
+    file already rotated by another worker reopens it instead of rotating (and deleting) it again.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self._lock_file = open(self.baseFilename + ".lock", "a") if fcntl else None
+
+    def reopen(self):
+        # A forked worker shares the parent's open file descriptions, and flock does not exclude processes that
+        # share one: each worker needs a lock file (and log stream) of its own
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = open(self.baseFilename + ".lock", "a")
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = self._open()
+
+    def _rotated_elsewhere(self) -> bool:
+        if self.stream is None:
+            return False
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = self._open()
+        now = int(time.time())
+        if now >= self.rolloverAt:
+            self.rolloverAt = self.computeRollover(now)
+
+    def doRollover(self):
+        if self._rotated_elsewhere():
+            self._reopen()
+            return
+        super().doRollover()
+
+    def emit(self, record):
+        if self._lock_file is None:
+            return super().emit(record)
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            if self._rotated_elsewhere():
+                self._reopen()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+
 log = logging.getLogger('werkzeug')
 log.addFilter(AjaxFilter())
 
@@ -20,7 +119,7 @@ log.addFilter(AjaxFilter())
 log_file = os.path.join(log_directory, "app.log")
 
 # Set up file logging (rotating logs daily)
-file_handler = TimedRotatingFileHandler(
+file_handler = MultiProcessTimedRotatingFileHandler(
     log_file, when="midnight", interval=1, backupCount=30, encoding="utf-8"
 )
 file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
@@ -31,8 +130,38 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 console_handler.setLevel(logging.INFO)
 
+for handler in (file_handler, console_handler):
+    handler.addFilter(TruncateFilter(LOG_MAX_MESSAGE_CHARS))
+
+# Handlers run on the listener thread, request threads only put records on the queue
+queue_handler = NonBlockingQueueHandler(None)
+listener = None
+
+
+def _start_listener():
+    global listener
+    queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+
+
+def _after_fork():
+    # Forked worker processes inherit the queue and the open log files but not the listener thread
+    file_handler.reopen()
+    _start_listener()
+
+
+def _stop_listener():
+    if listener is not None:
+        listener.stop()
+
+
+_start_listener()
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
 # Get the root logger and configure it
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+logger.addHandler(queue_handler)
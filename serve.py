@@ -0,0 +1,113 @@
+import os
+import tempfile
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+from logger import logger
+
+load_dotenv()
+
+SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:5007")
+# "threaded": one process serving SERVER_THREADS requests at a time
+# "process": SERVER_WORKERS processes, each with SERVER_THREADS threads (plain sync workers when it is 1)
+SERVER_WORKER_MODEL = os.getenv("SERVER_WORKER_MODEL", "threaded")
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "2"))
+# Each request holds one thread until it returns, waiting on its upstream calls included, so a process never has
+# more than SERVER_THREADS requests in flight; a waiting thread costs little CPU, raise it for slow-upstream traffic
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+# Pending connections the kernel queues while every worker is busy
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+# On SIGTERM workers stop accepting and get this many seconds to finish in-flight requests
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+# A worker silent for longer than this is killed and replaced
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "120"))
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))
+
+
+def warm_up():
+    # Runs in every worker before it accepts traffic; a failing upstream must not keep the worker down
+    from utils import async_client, http_client
+    from utils.users_directory import users_directory
+
+    if not users_directory.refresh():
+        logger.warning("Users directory could not be loaded during warm up")
+    try:
+        # Starts the upstream loop and leaves a keep-alive GHL connection in the async pool routes use
+        async_client.run(
+            async_client.request("HEAD", http_client.GHL_BASE_URL, timeout=(http_client.CONNECT_TIMEOUT, 5))
+        )
+    except Exception as e:
+        logger.warning("Could not open a GHL connection during warm up: %s", e)
+
+
+def prepare_metrics_dir():
+    # Workers write their metrics to files here and /metrics adds them up (utils/metrics.py). It has to be in
+    # the environment before any worker imports prometheus_client, and samples of a previous run are dropped.
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="app-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def child_exit(server, worker):
+    from utils import metrics
+
+    metrics.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    warm_up()
+    logger.info("Worker %s is warmed up and accepting requests", worker.pid)
+
+
+def build_options() -> dict:
+    if SERVER_WORKER_MODEL == "threaded":
+        workers, worker_class = 1, "gthread"
+    elif SERVER_WORKER_MODEL == "process":
+        workers, worker_class = SERVER_WORKERS, "gthread" if SERVER_THREADS > 1 else "sync"
+    else:
+        raise ValueError(f"Unknown SERVER_WORKER_MODEL {SERVER_WORKER_MODEL!r}, use 'threaded' or 'process'")
+    return {
+        "bind": SERVER_BIND,
+        "workers": workers,
+        "worker_class": worker_class,
+        "threads": SERVER_THREADS,
+        "backlog": SERVER_BACKLOG,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "timeout": SERVER_TIMEOUT,
+        "keepalive": SERVER_KEEPALIVE,
+        "post_worker_init": post_worker_init,
+        "child_exit": child_exit,
+    }
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+
+        return app
+
+
+def main():
+    options = build_options()
+    prepare_metrics_dir()
+    logger.info(
+        "Starting app on %s: %s model, %d worker(s) x %d thread(s)",
+        options["bind"], SERVER_WORKER_MODEL, options["workers"], options["threads"],
+    )
+    Server(options).run()
+
+
+if __name__ == '__main__':
+    main()
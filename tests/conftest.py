@@ -0,0 +1,22 @@
+import pytest
+
+
+class Clock:
+    """Stands in for the ``time`` module of the code under test: every clock reads ``now``, sleep advances it."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    monotonic = perf_counter = time
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """A Clock at 1000.0; patch it over the module under test, e.g. ``monkeypatch.setattr(module, "time", clock)``."""
+    return Clock()
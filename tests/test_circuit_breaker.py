@@ -0,0 +1,145 @@
+import pytest
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamUnavailable
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def make_breaker(**kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=5, slow_call_rate=0.8,
+                   open_seconds=30, half_open_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def call(breaker, seconds=0.1, failed=False):
+    probe = breaker.allow()
+    breaker.record(probe, seconds, failed)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_needs_min_calls_before_opening(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_failure_rate_below_threshold_stays_closed(clock):
+    breaker = make_breaker()
+    for failed in (True, False, False, False, True, False, False):
+        call(breaker, failed=failed)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_open_the_breaker(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, seconds=6)
+    assert breaker.state == OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, failed=True)
+    clock.now += 11
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 1
+
+
+def test_cancelled_calls_are_not_counted(clock):
+    breaker = make_breaker()
+    for _ in range(10):
+        call(breaker, failed=None)
+    assert breaker.snapshot() == {"state": CLOSED, "calls": 0, "failures": 0, "slow_calls": 0}
+
+
+def test_open_breaker_fails_fast_until_open_seconds_pass(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 20
+    with pytest.raises(UpstreamUnavailable) as info:
+        breaker.allow()
+    assert info.value.retry_after == 10
+    clock.now += 10
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_limits_probes_and_closes_after_they_succeed(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    first, second = breaker.allow(), breaker.allow()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.allow()
+    breaker.record(first, 0.1, False)
+    assert breaker.state == HALF_OPEN
+    breaker.record(second, 0.1, False)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is False
+
+
+def test_failed_or_slow_probe_opens_again(clock):
+    for seconds, failed in ((0.1, True), (6, False)):
+        breaker = make_breaker()
+        trip(breaker)
+        clock.now += 30
+        breaker.record(breaker.allow(), seconds, failed)
+        assert breaker.state == OPEN
+
+
+def test_cancelled_probe_frees_its_slot(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    probe = breaker.allow()
+    breaker.record(probe, 0.1, None)
+    assert breaker.allow() is True
+
+
+def test_calls_started_before_opening_are_ignored(clock):
+    breaker = make_breaker()
+    late = breaker.allow()
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record(late, 0.1, True)
+    assert breaker.state == HALF_OPEN
+
+
+def test_protect_counts_5xx_and_exceptions_but_not_4xx(clock, monkeypatch):
+    breaker = make_breaker()
+    monkeypatch.setattr(circuit_breaker.circuit_breakers, "for_url", lambda url: breaker)
+    for status in (404, 422, 429, 400):
+        with circuit_breaker.protect("https://example.com") as outcome:
+            outcome.status = status
+    assert breaker.state == CLOSED
+    with circuit_breaker.protect("https://example.com") as outcome:
+        outcome.status = 503
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with circuit_breaker.protect("https://example.com"):
+                raise ConnectionError()
+    assert breaker.state == CLOSED
+    with circuit_breaker.protect("https://example.com") as outcome:
+        outcome.status = 500
+    assert breaker.state == OPEN
+    with pytest.raises(UpstreamUnavailable):
+        with circuit_breaker.protect("https://example.com"):
+            pass
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from utils.contact_mirror import ContactMirror
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return ContactMirror(path=str(tmp_path / "contacts.sqlite3"), max_age=60, enabled=True)
+
+
+def test_lookups_by_id_and_email(mirror):
+    mirror.put({"id": "c1", "email": "Lead@Example.com"})
+    mirror.put({"id": "c2"}, email="other@example.com")
+    assert mirror.get_by_id("c1") == {"id": "c1", "email": "Lead@Example.com"}
+    assert mirror.get_by_email("lead@example.COM") == {"id": "c1", "email": "Lead@Example.com"}
+    assert mirror.get_by_email("Other@example.com") == {"id": "c2"}
+    assert mirror.get_by_id("c3") is None
+
+
+def test_older_reads_never_replace_newer_data(mirror):
+    now = time.time()
+    mirror.put({"id": "c1", "version": 2}, synced_at=now)
+    mirror.put({"id": "c1", "version": 1}, synced_at=now - 1)
+    assert mirror.get_by_id("c1") == {"id": "c1", "version": 2}
+
+
+def test_a_change_drops_the_contact_and_blocks_reads_started_before_it(mirror):
+    started = time.time()
+    mirror.put({"id": "c1", "email": "a@b.co"}, synced_at=started - 10)
+    mirror.changed(contact_id="c1", contact={"id": "c1", "email": "a@b.co", "shape": "v1"})
+    assert mirror.get_by_id("c1") is None
+    assert mirror.get_by_email("a@b.co") is None
+    mirror.put({"id": "c1", "email": "a@b.co"}, synced_at=started)
+    assert mirror.get_by_id("c1") is None
+    mirror.put({"id": "c1", "email": "a@b.co", "version": 2})
+    assert mirror.get_by_id("c1") == {"id": "c1", "email": "a@b.co", "version": 2}
+
+
+def test_a_change_to_the_email_drops_the_row_found_by_it(mirror):
+    mirror.put({"id": "c1"}, email="old@b.co", synced_at=time.time() - 1)
+    mirror.changed(contact_id="c2", emails=("Old@b.co",))
+    assert mirror.get_by_email("old@b.co") is None
+    assert mirror.get_by_id("c1") is None
+
+
+def test_forget_by_email(mirror):
+    mirror.put({"id": "c1", "email": "a@b.co"}, synced_at=time.time() - 1)
+    mirror.forget(email="A@b.co")
+    assert mirror.get_by_id("c1") is None
+
+
+def test_rows_past_max_age_are_only_served_stale(mirror):
+    mirror.put({"id": "c1"}, synced_at=time.time() - 61)
+    assert mirror.get_by_id("c1") is None
+    assert mirror.get_by_id("c1", stale=True) == {"id": "c1"}
+
+
+def test_disabled_mirror_stores_nothing(tmp_path):
+    mirror = ContactMirror(path=str(tmp_path / "contacts.sqlite3"), enabled=False)
+    mirror.put({"id": "c1"})
+    assert mirror.get_by_id("c1") is None
@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils import create_lead
+from utils.contact_cache import MISS, lookup_cache
+
+
+def fake_get(status_code, body):
+    async def get(url, **kwargs):
+        return httpx.Response(status_code, json=body, request=httpx.Request("GET", url))
+
+    return get
+
+
+@pytest.mark.parametrize("status_code, body", [
+    (401, {"msg": "Unauthorized"}),
+    (403, {"msg": "Forbidden"}),
+    (429, {"msg": "Too many requests"}),
+    (500, {"msg": "Internal error"}),
+])
+def test_failing_lookup_raises_instead_of_reporting_not_found(monkeypatch, status_code, body):
+    email = f"lookup-{status_code}@example.com"
+    monkeypatch.setattr(create_lead.async_client, "get", fake_get(status_code, body))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(create_lead.ghl_contact_lookup_async(email))
+    assert lookup_cache.get_by_email(email) is MISS
+
+
+def test_empty_lookup_is_not_found_and_cached(monkeypatch):
+    email = "lookup-empty@example.com"
+    monkeypatch.setattr(create_lead.async_client, "get", fake_get(200, {"contacts": []}))
+    assert asyncio.run(create_lead.ghl_contact_lookup_async(email)) is None
+    assert lookup_cache.get_by_email(email) is None
+    lookup_cache.invalidate(email=email)
+
+
+def test_found_contact_is_returned(monkeypatch):
+    email = "lookup-found@example.com"
+    contact = {"id": "c1", "email": email}
+    monkeypatch.setattr(create_lead.async_client, "get", fake_get(200, {"contacts": [contact]}))
+    assert asyncio.run(create_lead.ghl_contact_lookup_async(email)) == contact
+    lookup_cache.invalidate(email=email)
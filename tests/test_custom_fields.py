@@ -0,0 +1,33 @@
+import copy
+
+from benchmarks.payloads import FB4S_LEAD
+from utils.custom_fields import build_custom_fields, build_filled_custom_fields
+
+POND = "qe4zFdjyWpWlKjUkJ1Oz"
+ABANDONED_POND_REASON = "Cv7kNq7m8CBVDh7n9XEj"
+LISTING_TYPE = "R3CCQhYeG4kZ5NSTW5vk"
+LISTING_URL = "ULUCaQYI9uurYn8mfpu9"
+
+
+def test_create_leaves_out_absent_pond_fields():
+    person = {
+        key: value for key, value in FB4S_LEAD["person"].items() if key not in ("pond", "customAbandonedPondReason")
+    }
+    custom_fields = build_custom_fields(person)
+    assert POND not in custom_fields
+    assert ABANDONED_POND_REASON not in custom_fields
+    assert custom_fields[LISTING_TYPE] == person.get("customListingType")
+    assert custom_fields[LISTING_URL] == "N/A"
+
+
+def test_create_sends_pond_fields_the_lead_carries():
+    person = copy.deepcopy(FB4S_LEAD["person"])
+    person.update(pond="Buyers", customAbandonedPondReason=None)
+    custom_fields = build_custom_fields(person)
+    assert custom_fields[POND] == "Buyers"
+    assert custom_fields[ABANDONED_POND_REASON] is None
+
+
+def test_update_only_sends_filled_fields():
+    custom_fields = build_filled_custom_fields({"pond": "", "customListingType": "Resale"}, {"url": "N/A"})
+    assert custom_fields == {LISTING_TYPE: "Resale"}
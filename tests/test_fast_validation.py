@@ -0,0 +1,115 @@
+"""FastSchema must load exactly like the marshmallow schema it wraps: same result or same error messages.
+
+Randomly mutated route payloads are loaded both ways; a schema change that the fast path gets wrong fails here.
+"""
+import copy
+import random
+
+import pytest
+from marshmallow import ValidationError
+
+from benchmarks.payloads import FB4S_LEAD
+from validation.add_tags_validation import tags_validation
+from validation.create_lead_validation import post_lead_schema
+from validation.fast_validation import FastSchema
+from validation.followers_validation import followers_schema
+from validation.notes_validation import notes_validation
+from validation.task_validation import task_validation
+from validation.update_lead_validation import update_lead_schema
+
+MUTATIONS_PER_ROUTE = 3000
+
+ROUTES = {
+    "POST /lead": (post_lead_schema, FB4S_LEAD),
+    "PUT /lead/<id>": (update_lead_schema, {"person": {
+        key: value for key, value in FB4S_LEAD["person"].items() if key not in ("id", "customFB4SInquiriesCounter")
+    }}),
+    "POST /lead/<id>/notes": (notes_validation, {key: value for key, value in FB4S_LEAD.items() if key != "person"}),
+    "POST /lead/<id>/tasks": (task_validation, {"title": "Call back", "dueDate": "2025-03-15T11:00:00Z",
+                                                "description": "Showing", "assignedTo": "9pXq0rOQJOUWOxDmnMHP"}),
+    "POST /lead/<id>/followers": (followers_schema, {"followers": ["Fo7TmuqqwHIM22eno39t", "9pXq0rOQJOUWOxDmnMHP"]}),
+    "PATCH /lead/<id>/tags": (tags_validation, {"tags": ["fb4s", "buyer"]}),
+}
+
+# Values that are valid for some fields, convertible for others and invalid for the rest
+REPLACEMENTS = (
+    None, "", "N/A", "text", "42", "4.2", "true", "not-an-email", "buyer@example.com", "https://fb4s.com/x",
+    "fb4s.com/no-scheme", 0, 7, -1, 4.2, 4.0, True, False, [], ["a"], [None], [{"value": "a@b.co"}], {}, {"x": 1},
+    {"value": "a@b.co"}, {"city": "Toronto"},
+)
+
+
+def _paths(value, path=()):
+    yield path
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _paths(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _paths(item, path + (index,))
+
+
+def _mutate(payload, rng: random.Random):
+    payload = copy.deepcopy(payload)
+    for _ in range(rng.randint(1, 3)):
+        path = rng.choice([path for path in _paths(payload) if path])
+        parent = payload
+        for step in path[:-1]:
+            parent = parent[step]
+        last = path[-1]
+        action = rng.random()
+        if action < 0.2 and isinstance(parent, dict):
+            del parent[last]
+        elif action < 0.3 and isinstance(parent, dict):
+            parent[f"unknown_{rng.randint(0, 9)}"] = rng.choice(REPLACEMENTS)
+        elif action < 0.4 and isinstance(parent, list):
+            parent.append(copy.deepcopy(rng.choice(REPLACEMENTS + tuple(parent))))
+        else:
+            parent[last] = copy.deepcopy(rng.choice(REPLACEMENTS))
+        if not payload:
+            break
+    return payload
+
+
+def _outcome(load, payload):
+    try:
+        return "loaded", load(payload)
+    except ValidationError as err:
+        return "error", err.messages
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_valid_payload_takes_the_fast_path(route):
+    fast_schema, payload = ROUTES[route]
+    assert fast_schema._load is not None
+    assert fast_schema._load(copy.deepcopy(payload)) == fast_schema.schema.load(copy.deepcopy(payload))
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_mutated_payloads_load_like_marshmallow(route):
+    fast_schema, payload = ROUTES[route]
+    rng = random.Random(route)
+    for _ in range(MUTATIONS_PER_ROUTE):
+        mutated = _mutate(payload, rng)
+        expected = _outcome(fast_schema.schema.load, copy.deepcopy(mutated))
+        assert _outcome(fast_schema.load, copy.deepcopy(mutated)) == expected, mutated
+
+
+@pytest.mark.parametrize("payload", (None, [], "text", 7, [FB4S_LEAD]))
+def test_non_object_payloads_fail_like_marshmallow(payload):
+    assert _outcome(post_lead_schema.load, payload) == _outcome(post_lead_schema.schema.load, payload)
+
+
+def test_unsupported_schema_always_uses_marshmallow():
+    from marshmallow import Schema, fields, post_load
+
+    class HookedSchema(Schema):
+        name = fields.Str()
+
+        @post_load
+        def upper(self, data, **kwargs):
+            return {"name": data["name"].upper()}
+
+    fast_schema = FastSchema(HookedSchema())
+    assert fast_schema._load is None
+    assert fast_schema.load({"name": "x"}) == {"name": "X"}
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils import update_lead
+
+
+@pytest.fixture
+def make(monkeypatch):
+    calls = []
+    answer = {"status": 200, "body": {"contact": {"id": "c1", "followers": ["u1", "u2"]}}}
+
+    async def get(url, json, **kwargs):
+        return httpx.Response(answer["status"], json=answer["body"], request=httpx.Request("GET", "https://make.test"))
+
+    async def post(url, json, **kwargs):
+        calls.append((json["action"], json.get("followers") or json["body"]))
+        return httpx.Response(200, json={"status_code": 201 if json["action"] == "add" else 200},
+                              request=httpx.Request("POST", "https://make.test"))
+
+    async def contact_changed(**kwargs):
+        pass
+
+    monkeypatch.setattr(update_lead.async_client, "get", get)
+    monkeypatch.setattr(update_lead.async_client, "post", post)
+    monkeypatch.setattr(update_lead, "contact_changed", contact_changed)
+    return answer, calls
+
+
+def test_only_the_difference_is_sent(make):
+    _, calls = make
+    result = asyncio.run(update_lead.add_followers_async("c1", {"followers": ["u2", "u3", "u3"]}))
+    assert result == {"status_code": 201, "added": ["u3"], "removed": ["u1"]}
+    assert sorted(action for action, _ in calls) == ["add", "delete"]
+
+
+def test_failing_make_read_raises_a_status_error(make):
+    answer, calls = make
+    answer.update(status=500, body={"error": "scenario failed"})
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(update_lead.add_followers_async("c1", {"followers": ["u1"]}))
+    assert calls == []
+
+
+def test_missing_contact_is_reported(make):
+    answer, calls = make
+    answer["body"] = {"contact": None}
+    with pytest.raises(ValueError, match="c1 was not found"):
+        asyncio.run(update_lead.add_followers_async("c1", {"followers": ["u1"]}))
+    assert calls == []
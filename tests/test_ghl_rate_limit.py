@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import requests
+
+from utils import async_client, http_client
+
+URL = http_client.GHL_BASE_URL + "contacts/abc"
+
+
+def requests_response(status_code, retry_after=None):
+    response = requests.Response()
+    response.status_code = status_code
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+@pytest.fixture
+def sync_ghl(monkeypatch):
+    """GHL answering the queued statuses in order, with the shared bucket turned off."""
+    ghl = SimpleNamespace(statuses=[], calls=0, sleeps=[])
+
+    def send(method, url, **kwargs):
+        ghl.calls += 1
+        status_code, retry_after = ghl.statuses.pop(0)
+        return requests_response(status_code, retry_after)
+
+    monkeypatch.setattr(http_client, "ghl_rate_limiter", None)
+    monkeypatch.setattr(http_client, "_send", send)
+    monkeypatch.setattr(http_client, "time", SimpleNamespace(sleep=ghl.sleeps.append))
+    return ghl
+
+
+def test_429_is_retried_without_the_bucket(sync_ghl):
+    sync_ghl.statuses = [(429, "2"), (200, None)]
+    assert http_client.get(URL).status_code == 200
+    assert sync_ghl.calls == 2
+    assert sync_ghl.sleeps == [2.0]
+
+
+def test_429_gives_up_after_the_retries(sync_ghl):
+    sync_ghl.statuses = [(429, "1")] * (http_client.GHL_RATE_LIMIT_RETRIES + 1)
+    with pytest.raises(http_client.UpstreamRateLimited) as error:
+        http_client.get(URL)
+    assert error.value.retry_after == 1.0
+    assert sync_ghl.calls == http_client.GHL_RATE_LIMIT_RETRIES + 1
+
+
+def test_429_longer_than_max_wait_is_not_slept(sync_ghl):
+    sync_ghl.statuses = [(429, str(http_client.GHL_RATE_LIMIT_MAX_WAIT + 1))]
+    with pytest.raises(http_client.UpstreamRateLimited) as error:
+        http_client.get(URL)
+    assert error.value.retry_after == http_client.GHL_RATE_LIMIT_MAX_WAIT + 1
+    assert sync_ghl.sleeps == []
+
+
+def test_async_429_is_retried_without_the_bucket(monkeypatch):
+    statuses = [429, 429, 200]
+
+    async def send(method, url, **kwargs):
+        return httpx.Response(statuses.pop(0), headers={"Retry-After": "0"}, request=httpx.Request(method, url))
+
+    monkeypatch.setattr(async_client, "ghl_rate_limiter", None)
+    monkeypatch.setattr(async_client, "_send", send)
+    assert asyncio.run(async_client.get(URL)).status_code == 200
+    assert statuses == []
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from utils import idempotency
+from utils.idempotency import IN_PROGRESS, MISMATCH, REPLAY, STARTED, IdempotencyStore, request_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(path=str(tmp_path / "idempotency.sqlite3"), lock_timeout=300)
+
+
+def test_request_key_uses_the_header_or_the_payload():
+    payload = {"b": 1, "a": [1, 2]}
+    header_key, fingerprint, ttl = request_key("POST", "/lead", "abc", payload)
+    assert ttl == idempotency.IDEMPOTENCY_KEY_TTL
+    assert request_key("POST", "/lead", "abc", {"other": True})[0] == header_key
+    assert request_key("POST", "/lead/1/notes", "abc", payload)[0] != header_key
+    content_key, same_fingerprint, ttl = request_key("POST", "/lead", "", {"a": [1, 2], "b": 1})
+    assert (same_fingerprint, ttl) == (fingerprint, idempotency.IDEMPOTENCY_CONTENT_TTL)
+    assert content_key != header_key
+    assert request_key("POST", "/lead", "", {"a": [2, 1], "b": 1})[0] != content_key
+
+
+def test_first_request_starts_and_duplicates_wait(store):
+    assert store.try_acquire("k", "f") == (STARTED, None)
+    assert store.try_acquire("k", "f") == (IN_PROGRESS, None)
+    assert store.try_acquire("k", "other payload") == (MISMATCH, None)
+
+
+def test_completed_response_is_replayed_until_it_expires(store, clock, monkeypatch):
+    monkeypatch.setattr(idempotency, "time", clock)
+    store.try_acquire("k", "f")
+    store.complete("k", {"status": 201, "body": {"id": "c1"}}, ttl=60)
+    assert store.try_acquire("k", "f") == (REPLAY, {"status": 201, "body": {"id": "c1"}})
+    clock.now += 61
+    assert store.try_acquire("k", "f") == (STARTED, None)
+
+
+def test_released_key_runs_again(store):
+    store.try_acquire("k", "f")
+    store.release("k")
+    assert store.try_acquire("k", "f") == (STARTED, None)
+
+
+def test_release_keeps_a_completed_response(store):
+    store.try_acquire("k", "f")
+    store.complete("k", {"status": 200}, ttl=60)
+    store.release("k")
+    assert store.try_acquire("k", "f") == (REPLAY, {"status": 200})
+
+
+def test_lock_of_a_dead_worker_expires(store, clock, monkeypatch):
+    monkeypatch.setattr(idempotency, "time", clock)
+    store.try_acquire("k", "f")
+    clock.now += 299
+    assert store.try_acquire("k", "f") == (IN_PROGRESS, None)
+    clock.now += 2
+    assert store.try_acquire("k", "f") == (STARTED, None)
+
+
+def test_acquire_waits_for_the_first_request(store):
+    store.try_acquire("k", "f")
+    done = threading.Timer(0.2, store.complete, ("k", {"status": 201}, 60))
+    done.start()
+    assert store.acquire("k", "f", timeout=5) == (REPLAY, {"status": 201})
+    done.join()
+
+
+def test_acquire_gives_up_after_the_timeout(store):
+    store.try_acquire("k", "f")
+    assert store.acquire("k", "f", timeout=0.2) == (IN_PROGRESS, None)
+
+
+def test_only_one_of_many_concurrent_requests_starts(store):
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(store.try_acquire("k", "f")[0])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert sorted(outcomes) == [IN_PROGRESS] * 7 + [STARTED]
@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimitExceeded, SharedTokenBucket, parse_retry_after
+
+
+@pytest.fixture
+def bucket(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return SharedTokenBucket("test", path=str(tmp_path / "rate_limit.sqlite3"), max_rate=10, burst=5, min_rate=1,
+                             recovery=0.5, max_wait=2)
+
+
+def test_burst_is_free_then_callers_queue_at_the_rate(bucket):
+    assert [bucket.reserve() for _ in range(5)] == [0] * 5
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.1, 0.2, 0.3])
+
+
+def test_tokens_refill_over_time(bucket, clock):
+    for _ in range(5):
+        bucket.reserve()
+    clock.now += 0.3
+    assert [bucket.reserve() for _ in range(4)] == pytest.approx([0, 0, 0, 0.1], abs=1e-9)
+
+
+def test_wait_beyond_max_wait_raises_without_taking_a_token(bucket, clock):
+    for _ in range(25):
+        bucket.reserve()
+    with pytest.raises(RateLimitExceeded):
+        bucket.reserve()
+    # The refused call gave its token back, so one token later the queue is exactly max_wait long again
+    clock.now += 0.1
+    assert bucket.reserve() == pytest.approx(2)
+
+
+def test_throttled_halves_the_rate_blocks_and_recovers(bucket, clock):
+    bucket.throttled(retry_after=3)
+    assert bucket.current_rate() == 5
+    with pytest.raises(RateLimitExceeded):
+        bucket.reserve()
+    clock.now += 1.5
+    assert bucket.reserve() == pytest.approx(1.5)
+    clock.now += 4
+    assert bucket.current_rate() == pytest.approx(7.75)
+    clock.now += 100
+    assert bucket.current_rate() == 10
+
+
+def test_rate_never_drops_below_min_rate(bucket):
+    for _ in range(10):
+        bucket.throttled(retry_after=0)
+    assert bucket.current_rate() == 1
+
+
+def test_buckets_sharing_a_file_share_the_budget(bucket):
+    other = SharedTokenBucket("test", path=bucket.path, max_rate=10, burst=5, max_wait=2)
+    for _ in range(3):
+        bucket.reserve()
+    assert [other.reserve() for _ in range(3)] == pytest.approx([0, 0, 0.1])
+    unrelated = SharedTokenBucket("other", path=bucket.path, max_rate=10, burst=5, max_wait=2)
+    assert unrelated.reserve() == 0
+
+
+def test_threads_get_their_own_connection(bucket):
+    waits = []
+    threads = [threading.Thread(target=lambda: waits.extend(bucket.reserve() for _ in range(3))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(waits) == pytest.approx([0] * 5 + [i / 10 for i in range(1, 11)])
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 2), ("", 2), ("7", 7), ("1.5", 1.5), ("-3", 0), ("soon", 2),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, default=2) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= parse_retry_after(value) <= 30
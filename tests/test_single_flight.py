@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return {"id": key}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("a", fetch, "a")))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("a", fetch, "a"))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert calls == ["a"]
+    assert results == [{"id": "a"}] * 5
+
+
+def test_nothing_is_cached_after_the_call():
+    flight = SingleFlight("test")
+    calls = []
+    for _ in range(3):
+        flight.do("a", calls.append, "a")
+    assert calls == ["a", "a", "a"]
+
+
+def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise LookupError("upstream down")
+
+    with pytest.raises(LookupError):
+        flight.do("a", fail)
+    assert flight.do("a", lambda: "ok") == "ok"
+
+
+def test_coroutines_share_one_call_and_its_exception():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        if key == "bad":
+            raise LookupError(key)
+        return key.upper()
+
+    async def main():
+        results = await asyncio.gather(*(flight.do_async("a", fetch, "a") for _ in range(5)))
+        errors = await asyncio.gather(*(flight.do_async("bad", fetch, "bad") for _ in range(3)),
+                                      return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert results == ["A"] * 5
+    assert calls == ["a", "bad"]
+    assert all(isinstance(error, LookupError) for error in errors)
+
+
+def test_thread_joins_a_call_running_on_an_event_loop():
+    flight = SingleFlight("test")
+    calls = []
+    joined = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "shared"
+
+    async def main():
+        thread = threading.Thread(target=lambda: joined.append(flight.do("a", lambda: "own call")))
+        call = asyncio.ensure_future(flight.do_async("a", fetch))
+        await asyncio.sleep(0.05)
+        thread.start()
+        result = await call
+        await asyncio.to_thread(thread.join, 5)
+        return result
+
+    assert asyncio.run(main()) == "shared"
+    assert joined == ["shared"]
+    assert calls == [1]
+
+
+def test_cancelled_leader_does_not_cancel_the_other_callers():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("a", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("a", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(main()) == "done"
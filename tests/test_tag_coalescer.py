@@ -0,0 +1,122 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils import add_tags
+from utils.add_tags import TagWriteCoalescer
+
+
+class FakeWrites:
+    """Stands in for write_tags: records every write and can be held open or made to fail."""
+
+    def __init__(self):
+        self.writes = []
+        self.release = None
+        self.error = None
+
+    async def __call__(self, ghl_id, additions):
+        self.writes.append((ghl_id, additions))
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"contact": {"id": ghl_id, "tags": additions}}
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    writes = FakeWrites()
+    monkeypatch.setattr(add_tags, "write_tags", writes)
+    return writes
+
+
+def test_additions_within_the_window_share_one_write(writes):
+    async def main():
+        coalescer = TagWriteCoalescer(window=0.02)
+        return await asyncio.gather(
+            coalescer.add("c1", ["a", "b"]), coalescer.add("c1", ["b", "c"]), coalescer.add("c2", ["x"]),
+        )
+
+    first, second, other = asyncio.run(main())
+    assert writes.writes == [("c1", ["a", "b", "c"]), ("c2", ["x"])]
+    assert first == second == {"contact": {"id": "c1", "tags": ["a", "b", "c"]}}
+    assert other == {"contact": {"id": "c2", "tags": ["x"]}}
+
+
+def test_additions_during_a_write_wait_for_it_and_go_in_one_batch(writes):
+    async def main():
+        coalescer = TagWriteCoalescer(window=0.01)
+        writes.release = asyncio.Event()
+        first = asyncio.ensure_future(coalescer.add("c1", ["a"]))
+        await asyncio.sleep(0.05)
+        later = [asyncio.ensure_future(coalescer.add("c1", [tag])) for tag in ("b", "c")]
+        await asyncio.sleep(0.05)
+        assert writes.writes == [("c1", ["a"])]
+        writes.release.set()
+        await asyncio.gather(first, *later)
+        assert coalescer._locks == {} and coalescer._pending == {}
+
+    asyncio.run(main())
+    assert writes.writes == [("c1", ["a"]), ("c1", ["b", "c"])]
+
+
+def test_failed_write_fails_every_caller_in_the_batch(writes):
+    writes.error = RuntimeError("GHL is down")
+
+    async def main():
+        coalescer = TagWriteCoalescer(window=0.01)
+        return await asyncio.gather(coalescer.add("c1", ["a"]), coalescer.add("c1", ["b"]), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["GHL is down"] * 2
+    assert len(writes.writes) == 1
+
+
+class FakeGhl:
+    """Answers the contact GET and PUT of write_tags with fixed statuses and records the PUTs."""
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.get_status = self.put_status = 200
+        self.puts = []
+
+    async def get(self, url, **kwargs):
+        body = {"contact": {"id": "c1", "tags": self.tags}} if self.get_status == 200 else {"msg": "error"}
+        return httpx.Response(self.get_status, json=body, request=httpx.Request("GET", url))
+
+    async def put(self, url, json, **kwargs):
+        self.puts.append((url, json))
+        body = {"contact": {"id": "c1", "tags": json["tags"]}} if self.put_status == 200 else {"msg": "error"}
+        return httpx.Response(self.put_status, json=body, request=httpx.Request("PUT", url))
+
+
+@pytest.fixture
+def ghl(monkeypatch):
+    ghl = FakeGhl(["a", "b"])
+    changed = []
+
+    async def contact_changed(**kwargs):
+        changed.append(kwargs)
+
+    monkeypatch.setattr(add_tags.async_client, "get", ghl.get)
+    monkeypatch.setattr(add_tags.async_client, "put", ghl.put)
+    monkeypatch.setattr(add_tags, "contact_changed", contact_changed)
+    ghl.changed = changed
+    return ghl
+
+
+def test_write_tags_puts_the_union_and_skips_unchanged_contacts(ghl):
+    assert asyncio.run(add_tags.write_tags("c1", ["b", "a"])) == {"contact": {"id": "c1", "tags": ["a", "b"]}}
+    assert ghl.puts == []
+    assert asyncio.run(add_tags.write_tags("c1", ["c", "a", "c"])) == {"contact": {"id": "c1", "tags": ["a", "b", "c"]}}
+    assert ghl.puts == [(add_tags.LEAD_BASE_URL + "c1", {"tags": ["a", "b", "c"]})]
+    assert len(ghl.changed) == 1
+
+
+@pytest.mark.parametrize("step", ["get_status", "put_status"])
+def test_failed_ghl_call_raises_and_changes_nothing(ghl, step):
+    setattr(ghl, step, 503)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(add_tags.write_tags("c1", ["c"]))
+    assert ghl.changed == []
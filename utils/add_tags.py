@@ -1,29 +1,96 @@
-import os
-import requests
+import asyncio
 import logging
+import os
 
 from dotenv import load_dotenv
 
+from utils import async_client
+from utils.contact_cache import contact_changed
+from utils.http_client import GHL_BASE_URL
+
 
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-
-LEAD_BASE_URL = "https://rest.gohighlevel.com/v1/contacts/"
+LEAD_BASE_URL = GHL_BASE_URL + "contacts/"
+# Seconds tag additions for one contact are collected before they are written together
+TAG_WRITE_COALESCE_WINDOW = float(os.getenv("TAG_WRITE_COALESCE_WINDOW", "0.05"))
 
 
-def get_existing_tags(ghl_id):
-    response = requests.get(f'{LEAD_BASE_URL}{ghl_id}', headers=HEADERS)
-    return response.json()["contact"].get('tags', [])
+async def get_contact(ghl_id):
+    response = await async_client.get(f'{LEAD_BASE_URL}{ghl_id}', ghl_auth=True)
+    response.raise_for_status()
+    return response.json()["contact"]
 
 
-def add_tags(ghl_id: str, tags_to_add: list):
-    # Getting existing tags and combine it with new tags
-    tags = get_existing_tags(ghl_id)
-    tags.extend(tags_to_add.get("tags"))
+async def write_tags(ghl_id: str, additions: list):
+    # Getting existing tags and combine it with new tags, keeping order and dropping duplicates
+    contact = await get_contact(ghl_id)
+    existing = contact.get('tags', [])
+    tags = list(dict.fromkeys([*existing, *additions]))
+    if tags == existing:
+        logger.info("Contact %s already has tags %s, nothing to write", ghl_id, additions)
+        return {"contact": contact}
     payload = {"tags": tags}
-    response = requests.put(LEAD_BASE_URL + ghl_id, headers=HEADERS, json=payload)
-    return response.json()
+    response = await async_client.put(LEAD_BASE_URL + ghl_id, ghl_auth=True, json=payload)
+    # A failed write must fail every request of the batch, not answer 201 without a contact
+    response.raise_for_status()
+    result = response.json()
+    await contact_changed(contact_id=ghl_id, contact=result.get("contact"))
+    return result
+
+
+class TagWriteCoalescer:
+    """Serializes tag writes per contact and merges additions that arrive close together.
+
+    Additions for a contact collect for ``window`` seconds, and for as long as the previous write for
+    that contact is still running. Then a single GET + PUT writes the union and every caller in the
+    batch gets its result. Runs on the upstream loop; writes from other processes can still interleave.
+    """
+
+    def __init__(self, window: float = TAG_WRITE_COALESCE_WINDOW):
+        self.window = window
+        # ghl_id -> (tags to add in arrival order, futures of the waiting callers)
+        self._pending = {}
+        self._locks = {}
+        self._flushes = set()
+
+    async def add(self, ghl_id: str, tags: list):
+        batch = self._pending.get(ghl_id)
+        if batch is None:
+            batch = self._pending[ghl_id] = ({}, [])
+            flush = asyncio.create_task(self._flush(ghl_id))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        batch[0].update(dict.fromkeys(tags))
+        future = asyncio.get_running_loop().create_future()
+        batch[1].append(future)
+        return await future
+
+    async def _flush(self, ghl_id: str):
+        await asyncio.sleep(self.window)
+        async with self._locks.setdefault(ghl_id, asyncio.Lock()):
+            # Taken only once the lock is ours, so additions made during the previous write join this one
+            tags, futures = self._pending.pop(ghl_id)
+            logger.info("Writing %d tag(s) to contact %s for %d request(s)", len(tags), ghl_id, len(futures))
+            try:
+                result = await write_tags(ghl_id, list(tags))
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in futures:
+                    if not future.done():
+                        future.set_result(result)
+        if ghl_id not in self._pending:
+            # No batch is waiting for this lock
+            self._locks.pop(ghl_id, None)
+
+
+tag_writes = TagWriteCoalescer()
+
+
+async def add_tags_async(ghl_id: str, tags_to_add: dict):
+    return await async_client.call(tag_writes.add(ghl_id, tags_to_add.get("tags")))
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+
+from utils import circuit_breaker, metrics
+from utils.http_client import (
+    CONNECT_TIMEOUT,
+    GHL_BASE_URL,
+    GHL_HEADERS,
+    GHL_RATE_LIMIT_RETRIES,
+    READ_TIMEOUT,
+    UpstreamRateLimited,
+    _retry_wait,
+)
+from utils.rate_limiter import ghl_rate_limiter, parse_retry_after
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+# Upstream connections one process opens across all hosts; calls beyond this wait for a free connection
+ASYNC_UPSTREAM_MAX_CONNECTIONS = int(os.getenv("ASYNC_UPSTREAM_MAX_CONNECTIONS", "200"))
+ASYNC_UPSTREAM_MAX_KEEPALIVE = int(os.getenv("ASYNC_UPSTREAM_MAX_KEEPALIVE", "50"))
+
+
+class UpstreamLoop:
+    """One event loop per process on a daemon thread, owning the shared httpx client.
+
+    Every upstream call of the process is multiplexed on this loop: views, jobs and other sync code hand
+    coroutines over with ``run``, coroutines running on another loop with ``call``. Work started here (like
+    background steps) outlives the request that started it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="upstream-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def client(self) -> httpx.AsyncClient:
+        # Only touched from the loop thread
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=ASYNC_UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=ASYNC_UPSTREAM_MAX_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    def reset(self):
+        # A forked worker inherits the object but not the loop thread or its connections
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    def on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+
+upstream_loop = UpstreamLoop()
+os.register_at_fork(after_in_child=upstream_loop.reset)
+
+
+def run(coro, timeout: float = None):
+    """Run ``coro`` on the upstream loop and block the calling thread until it is done."""
+    if upstream_loop.on_loop():
+        coro.close()
+        raise RuntimeError("run() would block the upstream loop, await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, upstream_loop.loop()).result(timeout)
+
+
+async def call(coro):
+    """Await ``coro`` on the upstream loop from any other event loop."""
+    if upstream_loop.on_loop():
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, upstream_loop.loop()))
+
+
+async def _send(method: str, url: str, **kwargs) -> httpx.Response:
+    with circuit_breaker.protect(url) as outcome, metrics.upstream_call(method, url, kwargs.get("json")) as call:
+        response = await upstream_loop.client().request(method, url, **kwargs)
+        call.status = outcome.status = response.status_code
+    return response
+
+
+async def _send_ghl(method: str, url: str, **kwargs) -> httpx.Response:
+    # Same budget and 429 handling as http_client; the SQLite bucket is touched off the loop
+    for attempt in range(GHL_RATE_LIMIT_RETRIES + 1):
+        if ghl_rate_limiter is not None:
+            wait = await asyncio.to_thread(ghl_rate_limiter.reserve)
+            metrics.RATE_LIMIT_WAIT.observe(wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        response = await _send(method, url, **kwargs)
+        if response.status_code != 429:
+            return response
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        logger.warning("GHL returned 429 for %s %s, Retry-After %.1fs (attempt %d)", method, url, retry_after, attempt + 1)
+        if ghl_rate_limiter is not None:
+            await asyncio.to_thread(ghl_rate_limiter.throttled, retry_after)
+            continue
+        wait = _retry_wait(attempt, retry_after)
+        if wait is None:
+            break
+        await asyncio.sleep(wait)
+    raise UpstreamRateLimited(f"GHL rate limit exceeded for {method} {url}", response=response, retry_after=retry_after)
+
+
+async def request(method: str, url: str, ghl_auth: bool = False, headers: dict = None, timeout=None,
+                  **kwargs) -> httpx.Response:
+    if not upstream_loop.on_loop():
+        return await call(request(method, url, ghl_auth=ghl_auth, headers=headers, timeout=timeout, **kwargs))
+    if ghl_auth:
+        headers = {**GHL_HEADERS, **(headers or {})}
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        timeout = httpx.Timeout(read, connect=connect)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    if url.startswith(GHL_BASE_URL):
+        return await _send_ghl(method, url, headers=headers, **kwargs)
+    return await _send(method, url, headers=headers, **kwargs)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+async def put(url: str, **kwargs) -> httpx.Response:
+    return await request("PUT", url, **kwargs)
+
+
+async def delete(url: str, **kwargs) -> httpx.Response:
+    return await request("DELETE", url, **kwargs)
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+from marshmallow import ValidationError
+
+from utils.circuit_breaker import UpstreamUnavailable
+from utils.create_lead import create_lead_result
+from utils.http_client import UpstreamRateLimited
+from utils.rate_limiter import RateLimitExceeded
+from utils.slack_troubleshooting import send_slack_notification
+from validation.create_lead_validation import post_lead_schema
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+# Leads of one bulk request being created in GHL at the same time
+BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", "8"))
+
+
+def _create_record(line_number: int, data: dict) -> dict:
+    try:
+        result, status_code = create_lead_result(data)
+    except UpstreamUnavailable as e:
+        logger.warning("Bulk line %s not created: %s", line_number, e)
+        return {"line": line_number, "status": 503, "message": str(e), "contact": None}
+    except (RateLimitExceeded, UpstreamRateLimited) as e:
+        logger.warning("Bulk line %s not created: %s", line_number, e)
+        return {"line": line_number, "status": 429, "message": str(e), "contact": None}
+    except Exception as e:
+        error_msg = traceback.format_exc()
+        send_slack_notification(f"Error while creating lead from bulk line {line_number}\n{e}\n{error_msg}")
+        logger.error("Error while creating lead from bulk line %s\n%s\n%s", line_number, e, error_msg)
+        return {"line": line_number, "status": 400, "message": f"error: {e}", "contact": None}
+    return {"line": line_number, "status": status_code, **result}
+
+
+def _validate_record(line_number: int, raw_line):
+    try:
+        record = json.loads(raw_line)
+    except ValueError as e:
+        return None, {"line": line_number, "status": 400, "message": f"Invalid JSON: {e}", "contact": None}
+    try:
+        return post_lead_schema.load(record), None
+    except ValidationError as err:
+        return None, {"line": line_number, "status": 406, "message": f"Validation error {err.messages}", "contact": None}
+
+
+def import_leads(lines, max_in_flight: int = BULK_MAX_IN_FLIGHT):
+    """Create a lead for every NDJSON line and yield per-line results as they complete.
+
+    At most ``max_in_flight`` leads are pending at once, so neither the input nor the results are
+    buffered beyond that. The last item is a summary of the whole import.
+    """
+    summary = {"total": 0, "created": 0, "existing": 0, "failed": 0}
+
+    def count(result):
+        if result["status"] == 201:
+            summary["created"] += 1
+        elif result["status"] == 200:
+            summary["existing"] += 1
+        else:
+            summary["failed"] += 1
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="bulk-import") as executor:
+        pending = set()
+        for line_number, raw_line in enumerate(lines, start=1):
+            if not raw_line.strip():
+                continue
+            summary["total"] += 1
+            data, error = _validate_record(line_number, raw_line)
+            if error is not None:
+                yield count(error)
+                continue
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield count(future.result())
+            pending.add(executor.submit(_create_record, line_number, data))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield count(future.result())
+
+    logger.info("Bulk lead import finished: %s", summary)
+    yield {"summary": summary}
@@ -0,0 +1,231 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from utils import metrics
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds of finished calls the failure and slow-call rates are computed over
+CIRCUIT_BREAKER_WINDOW = float(os.getenv("CIRCUIT_BREAKER_WINDOW", "30"))
+# Calls the window needs before it can trip, so a couple of early errors don't open the breaker
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "20"))
+# Share of calls failing (connection errors, timeouts, 5xx) that opens the breaker
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+# A call taking this long counts as slow; when this share of calls is slow the breaker opens as well
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "10"))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE", "0.8"))
+# Seconds an open breaker fails calls fast before letting probe calls through
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+# Probe calls a half-open breaker lets through; all must succeed to close it again
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "3"))
+# What lead reads do while their upstream is open: "stale" serves contacts cached past their TTL when there
+# are any, "fail" answers 503 right away
+CIRCUIT_BREAKER_FALLBACK = os.getenv("CIRCUIT_BREAKER_FALLBACK", "stale")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open; routes answer it with a 503."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable, its circuit breaker is open")
+        self.upstream = upstream
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream.
+
+    Closed: calls go through and their outcomes are kept for ``window`` seconds. Once at least
+    ``min_calls`` are in the window and the failure or slow-call rate reaches its threshold, the breaker
+    opens and every call fails fast with UpstreamUnavailable. After ``open_seconds`` it lets
+    ``half_open_calls`` probes through: all succeeding closes it, any failing opens it again.
+    """
+
+    def __init__(self, name: str, window: float = CIRCUIT_BREAKER_WINDOW, min_calls: int = CIRCUIT_BREAKER_MIN_CALLS,
+                 failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate: float = CIRCUIT_BREAKER_SLOW_CALL_RATE, open_seconds: float = CIRCUIT_BREAKER_OPEN_SECONDS,
+                 half_open_calls: int = CIRCUIT_BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        # (finished at, failed, slow) of calls made while closed, oldest first
+        self._calls = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        metrics.BREAKER_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    def _enter(self, state: str, now: float):
+        logger.warning("Circuit breaker for %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._calls.clear()
+        self._failures = self._slow = 0
+        self._probes = self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = now
+        metrics.BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+        metrics.BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def allow(self) -> bool:
+        """Admit one call or raise UpstreamUnavailable; returns whether the call is a half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    metrics.BREAKER_REJECTED.labels(self.name).inc()
+                    raise UpstreamUnavailable(self.name, remaining)
+                self._enter(HALF_OPEN, now)
+            if self._probes >= self.half_open_calls:
+                metrics.BREAKER_REJECTED.labels(self.name).inc()
+                raise UpstreamUnavailable(self.name, 1)
+            self._probes += 1
+            return True
+
+    def record(self, probe: bool, seconds: float, failed):
+        """Count a finished call; ``failed`` is None for calls that tell nothing (cancelled ones)."""
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                if self.state != HALF_OPEN:
+                    return
+                if failed is None:
+                    self._probes -= 1
+                elif failed or seconds >= self.slow_call_seconds:
+                    self._enter(OPEN, now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self._enter(CLOSED, now)
+                return
+            # Calls that started before the breaker opened don't count towards the next closed period
+            if self.state != CLOSED or failed is None:
+                return
+            slow = seconds >= self.slow_call_seconds
+            self._calls.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            horizon = now - self.window
+            while self._calls and self._calls[0][0] < horizon:
+                _, old_failed, old_slow = self._calls.popleft()
+                self._failures -= old_failed
+                self._slow -= old_slow
+            total = len(self._calls)
+            if total >= self.min_calls and (
+                self._failures >= self.failure_rate * total or self._slow >= self.slow_call_rate * total
+            ):
+                logger.error(
+                    "Circuit breaker for %s opens: %d of %d calls failed and %d were slow in the last %.0fs",
+                    self.name, self._failures, total, self._slow, self.window,
+                )
+                self._enter(OPEN, now)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            info = {"state": self.state}
+            if self.state == OPEN:
+                info["retry_after"] = max(0, math.ceil(self._opened_at + self.open_seconds - time.monotonic()))
+            else:
+                info["calls"] = len(self._calls)
+                info["failures"] = self._failures
+                info["slow_calls"] = self._slow
+            return info
+
+
+class CircuitBreakers:
+    """One breaker per upstream service (GHL, Make, Retool, auto-assign, Slack), created on first use."""
+
+    def __init__(self, enabled: bool = CIRCUIT_BREAKER_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def for_url(self, url: str):
+        if not self.enabled:
+            return None
+        upstream = metrics.upstream_of(url)
+        if upstream == "other":
+            return None
+        breaker = self._breakers.get(upstream)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(upstream)
+                if breaker is None:
+                    breaker = self._breakers[upstream] = CircuitBreaker(upstream)
+        return breaker
+
+    def reset(self):
+        # A forked worker starts with closed breakers of its own
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def snapshot(self) -> dict:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+
+circuit_breakers = CircuitBreakers()
+os.register_at_fork(after_in_child=circuit_breakers.reset)
+
+
+def is_failure(status_code: int) -> bool:
+    # 429s are the rate limiter's business and 4xx answers mean the upstream is up
+    return status_code >= 500
+
+
+class _Outcome:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+@contextmanager
+def protect(url: str):
+    """Admit a call to ``url`` through its upstream's breaker and record how it went.
+
+    Raises UpstreamUnavailable while the breaker is open; the caller sets ``status`` on the yielded object
+    from the response. Exceptions (connection errors, timeouts) count as failures.
+    """
+    outcome = _Outcome()
+    breaker = circuit_breakers.for_url(url)
+    if breaker is None:
+        yield outcome
+        return
+    probe = breaker.allow()
+    started = time.perf_counter()
+    failed = None
+    try:
+        yield outcome
+        failed = outcome.status is None or is_failure(outcome.status)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        breaker.record(probe, time.perf_counter() - started, failed)
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from utils import metrics
+from utils.contact_mirror import contact_mirror
+from utils.users_directory import normalize_email
+
+load_dotenv()
+
+# Seconds a found contact is served from memory. Every worker has its own caches and contact_changed only
+# reaches the worker that made the change, so a contact deleted or updated through another worker can be served
+# this long; kept short, shared state lives in the contact mirror
+CONTACT_CACHE_TTL = int(os.getenv("CONTACT_CACHE_TTL", "30"))
+# Seconds a "no such contact" answer is remembered; short, so a contact created elsewhere shows up soon
+CONTACT_CACHE_NEGATIVE_TTL = int(os.getenv("CONTACT_CACHE_NEGATIVE_TTL", "30"))
+CONTACT_CACHE_MAX_ENTRIES = int(os.getenv("CONTACT_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a contact's assignee is trusted for new tasks. Only the worker that made a create or update refreshes
+# it, and reassignments made in GHL refresh nothing, so it only spares the lookup for a burst of tasks
+CONTACT_ASSIGNEE_TTL = int(os.getenv("CONTACT_ASSIGNEE_TTL", "30"))
+
+# Returned by lookups when the cache knows nothing; None means "cached as not existing"
+MISS = object()
+
+
+class ContactCache:
+    """Contacts keyed by id with an email index, plus short-lived negative entries by email.
+
+    Writers (create, update, tags, delete) keep it consistent through ``put`` and ``invalidate``.
+    """
+
+    def __init__(self, name: str, ttl: int = CONTACT_CACHE_TTL, negative_ttl: int = CONTACT_CACHE_NEGATIVE_TTL,
+                 max_entries: int = CONTACT_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # id -> (expires at, contact, emails pointing at it), least recently used first
+        self._by_id = OrderedDict()
+        self._by_email = {}
+        # email -> expires at
+        self._missing = {}
+
+    def _get_id(self, contact_id, now, stale=False):
+        # Expired contacts stay until replaced or evicted, for stale reads while their upstream is down
+        entry = self._by_id.get(contact_id)
+        if entry is None or (entry[0] <= now and not stale):
+            return MISS
+        self._by_id.move_to_end(contact_id)
+        return entry[1]
+
+    def _drop(self, contact_id):
+        entry = self._by_id.pop(contact_id, None)
+        if entry is not None:
+            for email in entry[2]:
+                if self._by_email.get(email) == contact_id:
+                    del self._by_email[email]
+
+    def get_by_id(self, contact_id):
+        with self._lock:
+            contact = self._get_id(contact_id, time.monotonic())
+        metrics.cache_lookup(self.name, contact is not MISS)
+        return contact
+
+    def get_by_email(self, email):
+        contact = self._lookup_email(normalize_email(email), time.monotonic())
+        metrics.cache_lookup(self.name, contact is not MISS)
+        return contact
+
+    def get_stale_by_id(self, contact_id):
+        """The cached contact even past its TTL, or MISS; only for when the upstream can't be asked."""
+        with self._lock:
+            contact = self._get_id(contact_id, time.monotonic(), stale=True)
+        metrics.cache_lookup(self.name, contact is not MISS, result="stale" if contact is not MISS else "miss")
+        return contact
+
+    def get_stale_by_email(self, email):
+        contact = self._lookup_email(normalize_email(email), time.monotonic(), stale=True)
+        metrics.cache_lookup(self.name, contact is not MISS, result="stale" if contact is not MISS else "miss")
+        return contact
+
+    def _lookup_email(self, key, now, stale=False):
+        with self._lock:
+            contact_id = self._by_email.get(key)
+            if contact_id is not None:
+                return self._get_id(contact_id, now, stale)
+            expires = self._missing.get(key)
+            if expires is None:
+                return MISS
+            if expires <= now:
+                del self._missing[key]
+                return MISS
+            return None
+
+    def put(self, contact: dict, email: str = None):
+        contact_id = contact.get("id")
+        if not contact_id:
+            return
+        emails = {normalize_email(value) for value in (email, contact.get("email")) if value}
+        with self._lock:
+            self._drop(contact_id)
+            self._by_id[contact_id] = (time.monotonic() + self.ttl, contact, emails)
+            for key in emails:
+                self._by_email[key] = contact_id
+                self._missing.pop(key, None)
+            while len(self._by_id) > self.max_entries:
+                self._drop(next(iter(self._by_id)))
+
+    def put_missing(self, email: str):
+        with self._lock:
+            if len(self._missing) >= self.max_entries:
+                self._missing.clear()
+            self._missing[normalize_email(email)] = time.monotonic() + self.negative_ttl
+
+    def invalidate(self, contact_id: str = None, email: str = None):
+        with self._lock:
+            if contact_id:
+                self._drop(contact_id)
+            if email:
+                key = normalize_email(email)
+                self._missing.pop(key, None)
+                if key in self._by_email:
+                    self._drop(self._by_email[key])
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_email.clear()
+            self._missing.clear()
+
+
+# GHL v1 contacts: GET /contacts/lookup and the create, update and tags responses share this shape
+lookup_cache = ContactCache("contacts_lookup")
+# GHL 2.0 contacts read through the Make proxy (_get_lead_by_id_async, _get_lead_by_email_async)
+lead_cache = ContactCache("contacts_2_0")
+# Only {"id", "assignedTo"} of any contact shape, read by create_task instead of fetching the whole contact
+assignee_cache = ContactCache("contact_assignees", ttl=CONTACT_ASSIGNEE_TTL)
+
+
+def remember_assignee(contact: dict):
+    if not contact or not contact.get("id"):
+        return
+    if "assignedTo" in contact:
+        assignee_cache.put({"id": contact["id"], "assignedTo": contact["assignedTo"]})
+    else:
+        assignee_cache.invalidate(contact_id=contact["id"])
+
+
+async def contact_changed(contact_id: str = None, contact: dict = None, emails=()):
+    # Write-through hook for every path that mutates a contact; the in-process caches are updated before the
+    # first await, the SQLite mirror in a worker thread so the upstream loop doesn't wait on its lock
+    if contact_id:
+        lookup_cache.invalidate(contact_id=contact_id)
+        lead_cache.invalidate(contact_id=contact_id)
+        assignee_cache.invalidate(contact_id=contact_id)
+    for email in emails:
+        if email:
+            lookup_cache.invalidate(email=email)
+            lead_cache.invalidate(email=email)
+    if contact:
+        lookup_cache.put(contact, email=next((email for email in emails if email), None))
+        lead_cache.invalidate(contact_id=contact.get("id"), email=contact.get("email"))
+        remember_assignee(contact)
+    await asyncio.to_thread(contact_mirror.changed, contact_id=contact_id, contact=contact, emails=emails)
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from dotenv import load_dotenv
+
+from utils import metrics
+from utils.sqlite_db import SharedDatabase
+from utils.users_directory import normalize_email
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+CONTACT_MIRROR_ENABLED = os.getenv("CONTACT_MIRROR_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTACT_MIRROR_DB_PATH = os.getenv("CONTACT_MIRROR_DB_PATH", os.path.join("data", "contacts.sqlite3"))
+# Seconds a mirrored contact is served without asking GHL. Our own writes drop it at once, but a change made
+# elsewhere (GHL UI, workflows, other services) goes unseen for up to this long
+CONTACT_MIRROR_MAX_AGE = int(os.getenv("CONTACT_MIRROR_MAX_AGE", "120"))
+# The mirror is only a cache: a lookup or write that finds the database locked for this long gives up and the
+# read goes upstream instead. Async callers run it with asyncio.to_thread, never on the upstream loop.
+CONTACT_MIRROR_BUSY_TIMEOUT = 1
+# Tombstones only have to outlive reads that were already in flight when the contact changed (seconds)
+CONTACT_MIRROR_TOMBSTONE_TTL = 600
+# Old tombstones are deleted at most this often (seconds)
+CONTACT_MIRROR_PURGE_INTERVAL = 60
+
+# Rows hold contacts exactly as Make's GHL 2.0 reads return them, the shape the lead read routes answer with.
+# GHL v1 write responses have another shape, so a write only drops the contact and the next read refills it.
+# A row with a NULL contact is a tombstone: the contact changed or is gone, and reads that started before
+# synced_at must not bring the old version back. The table of the earlier layout, which also kept v1 rows and
+# a phone index, is dropped: the mirror is only a cache
+SCHEMA = """
+DROP TABLE IF EXISTS contacts;
+CREATE TABLE IF NOT EXISTS make_contacts (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    contact TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS make_contacts_email ON make_contacts (email);
+"""
+
+_UPSERT = (
+    "INSERT INTO make_contacts (id, email, contact, synced_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET email = excluded.email, contact = excluded.contact, "
+    "synced_at = excluded.synced_at WHERE excluded.synced_at >= make_contacts.synced_at"
+)
+_TOMBSTONE = (
+    "INSERT INTO make_contacts (id, synced_at) VALUES (?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET email = NULL, contact = NULL, "
+    "synced_at = excluded.synced_at WHERE excluded.synced_at >= make_contacts.synced_at"
+)
+
+
+class ContactMirror:
+    """Contacts read through Make, in SQLite shared by every worker process, indexed by id and email.
+
+    Filled by the lead reads and emptied for a contact by every write to it (contact_changed). Unlike
+    ContactCache it survives restarts and a change made by one worker is seen by all of them at once.
+    Every write carries the time its data was read upstream and never replaces newer data, so a slow read
+    finishing after an update doesn't undo it. Lookups return None when there is no fresh contact; the
+    mirror is a cache, so its own errors are logged and treated as misses.
+    """
+
+    def __init__(self, path: str = CONTACT_MIRROR_DB_PATH, max_age: int = CONTACT_MIRROR_MAX_AGE,
+                 enabled: bool = CONTACT_MIRROR_ENABLED):
+        self.path = path
+        self.max_age = max_age
+        self.enabled = enabled
+        # Losing the last writes to a power cut only costs upstream reads; skip the fsync per commit
+        self._db = SharedDatabase(path, SCHEMA, timeout=CONTACT_MIRROR_BUSY_TIMEOUT, synchronous="NORMAL")
+        self._last_purge = 0.0
+
+    def _get(self, column: str, value, stale: bool):
+        if not self.enabled or not value:
+            return None
+        try:
+            row = self._db.connection().execute(
+                f"SELECT contact, synced_at FROM make_contacts WHERE {column} = ? AND contact IS NOT NULL "
+                "ORDER BY synced_at DESC LIMIT 1",
+                (value,),
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Contact mirror lookup by %s failed", column)
+            return None
+        if row is None or (not stale and row["synced_at"] < time.time() - self.max_age):
+            metrics.cache_lookup("contact_mirror", False)
+            return None
+        metrics.cache_lookup("contact_mirror", True, result="stale" if stale else None)
+        return json.loads(row["contact"])
+
+    def get_by_id(self, contact_id: str, stale: bool = False):
+        """The mirrored contact, or None; ``stale`` also returns one past the freshness bound."""
+        return self._get("id", contact_id, stale)
+
+    def get_by_email(self, email: str, stale: bool = False):
+        return self._get("email", normalize_email(email) if email else None, stale)
+
+    def _write(self, action: str, statements):
+        if not self.enabled or not statements:
+            return
+        try:
+            connection = self._db.connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, parameters in statements:
+                    connection.execute(sql, parameters)
+                self._purge(connection)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            logger.exception("Contact mirror %s failed", action)
+
+    def _purge(self, connection):
+        now = time.time()
+        if now - self._last_purge < CONTACT_MIRROR_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        connection.execute(
+            "DELETE FROM make_contacts WHERE contact IS NULL AND synced_at < ?", (now - CONTACT_MIRROR_TOMBSTONE_TTL,)
+        )
+
+    @staticmethod
+    def _upsert(contact: dict, email: str, synced_at: float):
+        emails = [value for value in (contact.get("email"), email) if value]
+        return _UPSERT, (
+            contact["id"], normalize_email(emails[0]) if emails else None, json.dumps(contact), synced_at,
+        )
+
+    @staticmethod
+    def _forget(contact_id: str, email: str, as_of: float):
+        if contact_id:
+            yield _TOMBSTONE, (contact_id, as_of)
+        if email:
+            yield (
+                "UPDATE make_contacts SET email = NULL, contact = NULL, synced_at = ? "
+                "WHERE email = ? AND synced_at <= ?",
+                (as_of, normalize_email(email), as_of),
+            )
+
+    def put(self, contact: dict, email: str = None, synced_at: float = None):
+        """Mirror ``contact`` as Make returned it at ``synced_at`` (now by default).
+
+        ``email`` is the one it was looked up by.
+        """
+        if not contact or not contact.get("id"):
+            return
+        self._write("write", [self._upsert(contact, email, synced_at or time.time())])
+
+    def forget(self, contact_id: str = None, email: str = None, as_of: float = None):
+        """Stop serving a contact by id and/or email, unless it was mirrored again after ``as_of`` (now by default)."""
+        self._write("invalidation", list(self._forget(contact_id, email, as_of or time.time())))
+
+    def changed(self, contact_id: str = None, contact: dict = None, emails=()):
+        # contact_changed in one transaction: forget the contact under every id and email the write touched.
+        # The write's response is v1-shaped, so it isn't mirrored; the next lead read refills the row.
+        now = time.time()
+        statements = list(self._forget(contact_id, None, now))
+        if contact:
+            statements.extend(self._forget(contact.get("id"), contact.get("email"), now))
+        for email in emails:
+            statements.extend(self._forget(None, email, now))
+        self._write("invalidation", statements)
+
+
+contact_mirror = ContactMirror()
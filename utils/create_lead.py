@@ -1,21 +1,25 @@
+import asyncio
 import os
-import requests
 import logging
 
 from dotenv import load_dotenv
 
-from utils.create_note import create_lead_property_inquiry
+from utils import async_client
+from utils.http_client import GHL_BASE_URL
+from utils.contact_cache import MISS, contact_changed, lookup_cache
+from utils.create_note import create_lead_property_inquiry_async
+from utils.custom_fields import build_custom_fields
+from utils.slack_troubleshooting import send_slack_notification
+from utils.step_graph import StepGraph
+from utils.users_directory import users_directory
 from utils.utils import _get_user_by_email
 
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv("GHL_API_KEY")
-HEADERS = {"Authorization": f"Bearer {GHL_API_KEY}"}
-
-CREATE_LEAD_BASE_URL = "https://rest.gohighlevel.com/v1/contacts/"
-LOOKUP_BASE_URL = "https://rest.gohighlevel.com/v1/contacts/lookup?email="
+CREATE_LEAD_BASE_URL = GHL_BASE_URL + "contacts/"
+LOOKUP_BASE_URL = GHL_BASE_URL + "contacts/lookup?email="
 AUTO_ASSIGN_URL = os.getenv("AUTO_ASSIGN_URL")
 
 
@@ -28,18 +32,22 @@ BACKUP_ASSIGN_USER = {
 
 
 # Check if such contact already exists in GHL
-def ghl_contact_lookup(data, has_property):
-    lookup_email = data["person"]["emails"][0].get("value")
-    response = requests.get(LOOKUP_BASE_URL + lookup_email, headers=HEADERS)
-    logger.info(f"contact look up response\n{response.json()}")
-
-    if response.json().get("contacts"):
-        # If contact already exists in GHL and payload contains property - create only note (Property Inquiry)
-        if has_property:
-            ghl_id = response.json().get("contacts")[0].get("id")
-            create_lead_property_inquiry(ghl_id, data)
-        return True
-    return False
+async def ghl_contact_lookup_async(lookup_email):
+    cached = lookup_cache.get_by_email(lookup_email)
+    if cached is not MISS:
+        logger.info("contact look up served from cache for %s", lookup_email)
+        return cached
+    response = await async_client.get(LOOKUP_BASE_URL + lookup_email, ghl_auth=True)
+    # Treating a failing lookup (5xx, but also 401, 403 or 429) as "not found" would create a duplicate contact
+    if not response.is_success:
+        response.raise_for_status()
+    logger.info("contact look up response\n%s", response.json())
+    contacts = response.json().get("contacts")
+    if contacts:
+        lookup_cache.put(contacts[0], email=lookup_email)
+        return contacts[0]
+    lookup_cache.put_missing(lookup_email)
+    return None
 
 
 def prepare_json_data_for_auto_assign(data: dict) -> dict:
@@ -79,77 +87,112 @@ def prepare_json_data_for_ghl(data: dict) -> dict:
     result["state"] = person_data["addresses"][0].get("state")
     result["source"] = data.get("source")
     result["tags"] = person_data.get("tags")
-    result["customField"] = {
-        "R3CCQhYeG4kZ5NSTW5vk": person_data.get("customListingType"),  # Listing Type
-        "F4Bkzj3AXKtBiri6S3Xe": person_data.get("customFB4SRCAURL"),  # FB4S RCA URL
-        "tTqAgy8mKjYaoAWdEqm5": person_data.get("customFB4SLeadID"),  # FB4S Lead ID
-        "t7EBTF8Ub1JgdGl7N5mE": person_data.get("customBuyerProfileFB4S"),  # Buyer Profile FB4S
-        "5k6Sn4LgOC109kGbPKXA": person_data.get("customFB4SInquiriesCounter"),  # FB4S Inquiries Counter
-        "3kOQc4txrHj7dledzdNJ": person_data.get("customMLSNumber"),  # MLS Number
-        "KUpiQ32dAm11q4gu9MB1": person_data.get("customChromeExtensionLink"),  # Chrome Extension Link
-        "ULUCaQYI9uurYn8mfpu9": property_data.get("url", "N/A"),  # Listing URL
-        "2C3PcAa0JdOHRu95mWzp": person_data.get("customListingURLPath"),  # Listing URL Path
-        "pwwHyq93djePQzzMECFI": person_data.get("customAssignedNotFromWillowAt"),  # Assigned Not From Willow At
-        "01MYfI09Z919mFibcZNG": person_data.get("customExpectedPriceRange"),  # Expected Price Range
-        "EcWFyMMhEZuLm5hz9wpP": person_data.get("customProvince"),  # Province
-        "fNUZTAUpB0BiA3ff5nSG": person_data.get("customAddress"),  # Custom Address
-        "yIiyCWtlHAkfKrWwin3H": person_data.get("customCity"),  # Custom City
-        "WfBlGcyHtMZIy885bv2q": person_data.get("customStage"), # Stage
-        "zkkxcKSBxGG0AwKg7zb9": person_data.get("customPrice"), # Price
-        "kN2l6aNW601zksRV5L0D": person_data.get("customClosingAnniversary"), # Closing Anniversary
-        "xNiTcYOSPKyG6UK9PHEn": person_data.get("customYlopoSellerReport"), # Ylopo Seller Report
-        "uvG7VhHmPyqjD976RNoW": person_data.get("customParentCategory"), # Parent Category
-        "fkIooCxVyocAQeMlwWAo": person_data.get("customWhoareyou"), # Who are you?
-        "BWFdoHapnpo04EHpG5F0": person_data.get("customLastActivity"), # Last Activity
-        "SBQ7tdjkwFMumNkfGrHw": person_data.get("customCloseDate"), # Close Date
-        "SujDeGnOKJXlifbU7fLo": person_data.get("customLisitngPushesSent"), # Lisitng Pushes Sent
-        "gpGUaXRBHdURtrh7nmlF": person_data.get("customYlopoStarsLink"), # Ylopo Stars Link
-        "LzbUJkxo7kRClIomCc0U": person_data.get("customOldID"), # Old ID
-    }
-    if not result["assignedTo"]: # If there is no selected_realtor_email and no property then lead is assigned to willow master acc
+    result["customField"] = build_custom_fields(person_data, property_data)
+    if not result.get("assignedTo"): # If there is no selected_realtor_email and no property then lead is assigned to willow master acc
         logger.info("No suitable users were found to auto-assign. Assign to Willow-master acc")
         result["assignedTo"] = BACKUP_ASSIGN_USER.get("id")
     return result
 
 
 def get_user_to_auto_assign(data: dict):
-    users = requests.get( # In production change port from 5000 to 5007
-        "http://127.0.0.1:5007/users", headers={"x-api-key": os.getenv("FLASK_API_KEY")}
-    ).json()
-
-    potential_number_1_user = data.get("assigned_realtor")
-    possible_users = data.get("possible_realtors")
-    for user in users["users"]: # Find potential user GHL id
-        if user.get("email") == potential_number_1_user:
+    # assigned_realtor has priority, then possible_realtors in the order the auto-assign service ranked them
+    candidates = [data.get("assigned_realtor"), *(data.get("possible_realtors") or [])]
+    for candidate in candidates:
+        if not candidate:
+            continue
+        user = users_directory.get_by_email(candidate)
+        if user:
             return user
-    for possible_user in possible_users: # If potential user were not found in GHL user - we search by possible users
-        for user in users["users"]:
-            if user.get("email") == possible_user:
-                return user
     # If we don't find realtor to assign - we assign lead to willow-master acc
     logger.info("No suitable users were found to auto-assign. Assign to Willow-master acc")
     return BACKUP_ASSIGN_USER
 
 
-def create_ghl_lead(data, has_property):
-    existing_lead = ghl_contact_lookup(data, has_property)
-    if existing_lead:
-        return None
-    else:
-        # if there is no such lead in GHL - create a lead and if payload contains property create note(Property Inquiry)
-        if has_property and not data["person"].get("selected_realtor_email"):
-            assign_payload = prepare_json_data_for_auto_assign(data)
-            auto_assign_response = requests.post(AUTO_ASSIGN_URL, json=assign_payload)
-            existing_possible_realtor = get_user_to_auto_assign(auto_assign_response.json())
-            logger.info(f"Realtor to auto assign: {existing_possible_realtor}")
-            data["person"]["auto_assign_user_id"] = existing_possible_realtor.get("id")
-
-        prepared_ghl_json = prepare_json_data_for_ghl(data)
-        logger.info(f"{prepared_ghl_json}")
-        response = requests.post(
-            CREATE_LEAD_BASE_URL, json=prepared_ghl_json, headers=HEADERS
-        )
+async def request_auto_assign(data: dict) -> dict:
+    assign_payload = prepare_json_data_for_auto_assign(data)
+    auto_assign_response = await async_client.post(AUTO_ASSIGN_URL, json=assign_payload)
+    # A users directory miss may refresh it over HTTP, keep that off the loop
+    existing_possible_realtor = await asyncio.to_thread(get_user_to_auto_assign, auto_assign_response.json())
+    logger.info("Realtor to auto assign: %s", existing_possible_realtor)
+    return existing_possible_realtor
+
+
+async def post_ghl_contact(data: dict, auto_assign_user: dict = None) -> dict:
+    if auto_assign_user:
+        data["person"]["auto_assign_user_id"] = auto_assign_user.get("id")
+    prepared_ghl_json = await asyncio.to_thread(prepare_json_data_for_ghl, data)
+    logger.info("%s", prepared_ghl_json)
+    response = await async_client.post(
+        CREATE_LEAD_BASE_URL, json=prepared_ghl_json, ghl_auth=True
+    )
+    # A rejected create (422 for an invalid field, 5xx) must fail the request, not come back as a created lead
+    response.raise_for_status()
+    return response.json()
+
+
+async def create_new_contact_inquiry(data: dict, created: dict):
+    return await create_lead_property_inquiry_async(created.get("contact").get("id"), data)
+
+
+def _log_background_note(graph: StepGraph, note):
+    error = None if note.cancelled() else note.exception()
+    if error is not None:
+        send_slack_notification(f"Error while creating inquiry note for a new lead\n{error}")
+        logger.error("Error while creating inquiry note for a new lead\n%s", error, exc_info=error)
+    logger.info("%s: note=%.0fms", graph.name, graph.timings.get("note", 0) * 1000)
+
+
+async def create_ghl_lead_async(data, has_property):
+    # lookup and auto_assign are independent and run at the same time; create waits for both and the
+    # inquiry note runs after create without holding the response
+    graph = StepGraph("create lead")
+    lookup_email = data["person"]["emails"][0].get("value")
+    graph.add("lookup", ghl_contact_lookup_async, lookup_email)
+    needs_auto_assign = has_property and not data["person"].get("selected_realtor_email")
+    if needs_auto_assign:
+        graph.add("auto_assign", request_auto_assign, data)
+
+    try:
+        existing_contact = await graph.result("lookup")
+    except BaseException:
+        graph.cancel("auto_assign")
+        raise
+    if existing_contact:
+        # No realtor to assign: stop waiting for it (the request may already have been sent)
+        graph.cancel("auto_assign")
+        # If contact already exists in GHL and payload contains property - create only note (Property Inquiry)
         if has_property:
-            ghl_id = response.json().get("contact").get("id")
-            create_lead_property_inquiry(ghl_id, data)
-        return response.json()
+            graph.add("note", create_lead_property_inquiry_async, existing_contact.get("id"), data)
+            await graph.result("note")
+        graph.log_timings()
+        return None
+
+    # if there is no such lead in GHL - create a lead and if payload contains property create note(Property Inquiry)
+    graph.add("create", post_ghl_contact, data, after=("auto_assign",) if needs_auto_assign else ())
+    created = await graph.result("create")
+    graph.log_timings()
+    await contact_changed(contact=created.get("contact"), emails=(lookup_email,))
+    if has_property:
+        note = graph.add("note", create_new_contact_inquiry, data, after=("create",))
+        note.add_done_callback(lambda task: _log_background_note(graph, task))
+    return created
+
+
+# Shared by POST /lead, lead jobs and bulk import: returns (response body, HTTP status)
+async def create_lead_result_async(data: dict) -> tuple:
+    has_property = 'property' in data
+    lead = await create_ghl_lead_async(data, has_property)
+
+    if not lead:
+        logger.info("User was not created\n%s", lead)
+        return {"message": "User was not created, already exists. Added inquiry note if provided", "contact": lead}, 200
+
+    if not lead.get("contact"):
+        # Never a 201 without the contact: POST /lead stores 2xx answers and replays them to retries
+        raise ValueError(f"GHL create returned no contact: {lead}")
+    logger.info("User was created\n%s", lead)
+    return {"message": "Lead successfully created", "contact": lead.get("contact")}, 201
+
+
+def create_lead_result(data: dict) -> tuple:
+    return async_client.run(create_lead_result_async(data))
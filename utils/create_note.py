@@ -1,17 +1,15 @@
-import os
-
-import requests
 import logging
 
 from dotenv import load_dotenv
 
+from utils import async_client
+from utils.http_client import GHL_BASE_URL
+
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-BASE_NOTES_URL = "https://rest.gohighlevel.com/v1/contacts/"
+BASE_NOTES_URL = GHL_BASE_URL + "contacts/"
 
 
 # Prepare html string for inquiry note
@@ -25,13 +23,13 @@ def prepare_inquiry_note(data):
     return note
 
 
-def create_lead_property_inquiry(ghl_id: str, data: dict):
+async def create_lead_property_inquiry_async(ghl_id: str, data: dict):
     note_body = prepare_inquiry_note(data)
-    logger.info(f"Property Inquiry note: {note_body}")
+    logger.info("Property Inquiry note: %s", note_body)
     note_payload = {"body": note_body}
-    response = requests.post(BASE_NOTES_URL + ghl_id + "/notes", json=note_payload, headers=HEADERS)
+    response = await async_client.post(BASE_NOTES_URL + ghl_id + "/notes", json=note_payload, ghl_auth=True)
+    # A failed write must not come back as a success, idempotent retries would replay it
+    response.raise_for_status()
     response = response.json()
-    logger.info(f"inquiry response\n{response}")
+    logger.info("inquiry response\n%s", response)
     return response
-
-
@@ -1,38 +1,51 @@
-import os
-
-import requests
 import logging
 
 from dotenv import load_dotenv
 
-from utils.utils import _get_lead_by_id
+from utils import async_client
+from utils.contact_cache import MISS, assignee_cache
+from utils.http_client import GHL_BASE_URL
+from utils.utils import _get_lead_by_id_async
 
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-BASE_TASK_URL = "https://rest.gohighlevel.com/v1/contacts/"
+BASE_TASK_URL = GHL_BASE_URL + "contacts/"
 
 
 # Prepare html string for inquiry note
-def prepare_task_payload(data, lead):
+def prepare_task_payload(data, assigned_to):
     task = {}
     task["title"] = data.get("title")
     task["dueDate"] = data.get("dueDate")
     task["description"] = data.get("description")
-    task["assignedTo"] = lead.get("assignedTo")
+    task["assignedTo"] = assigned_to
     task["status"] = "incompleted"
     return task
 
 
-def create_task(ghl_id: str, data: dict):
-    lead = _get_lead_by_id(ghl_id)
-    task_body = prepare_task_payload(data, lead)
-    response = requests.post(BASE_TASK_URL + ghl_id + "/tasks", json=task_body, headers=HEADERS)
+async def get_task_assignee(ghl_id: str):
+    cached = assignee_cache.get_by_id(ghl_id)
+    if cached is not MISS:
+        logger.info("Assignee of %s served from cache", ghl_id)
+        return cached.get("assignedTo")
+    lead = await _get_lead_by_id_async(ghl_id)
+    if not lead:
+        raise ValueError(f"There is no such contact with id = {ghl_id}")
+    return lead.get("assignedTo")
+
+
+async def create_task_async(ghl_id: str, data: dict):
+    # An explicit assignedTo in the payload skips the contact lookup
+    if "assignedTo" in data:
+        assigned_to = data["assignedTo"]
+    else:
+        assigned_to = await get_task_assignee(ghl_id)
+    task_body = prepare_task_payload(data, assigned_to)
+    response = await async_client.post(BASE_TASK_URL + ghl_id + "/tasks", json=task_body, ghl_auth=True)
+    # A failed write must not come back as a success, idempotent retries would replay it
+    response.raise_for_status()
     response = response.json()
-    logger.info(f"Create task response\n{response}")
+    logger.info("Create task response\n%s", response)
     return response
-
-
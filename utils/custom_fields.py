@@ -0,0 +1,84 @@
+# Default for fields create leaves out of the payload when the lead doesn't carry them
+OMIT = object()
+
+# GHL custom field id -> where its value comes from in a lead payload ("person" or "property"), the key
+# there and the value create sends when the key is missing. Create and update both map through this table.
+CUSTOM_FIELDS = (
+    ("R3CCQhYeG4kZ5NSTW5vk", "person", "customListingType", None),  # Listing Type
+    ("F4Bkzj3AXKtBiri6S3Xe", "person", "customFB4SRCAURL", None),  # FB4S RCA URL
+    ("tTqAgy8mKjYaoAWdEqm5", "person", "customFB4SLeadID", None),  # FB4S Lead ID
+    ("t7EBTF8Ub1JgdGl7N5mE", "person", "customBuyerProfileFB4S", None),  # Buyer Profile FB4S
+    ("5k6Sn4LgOC109kGbPKXA", "person", "customFB4SInquiriesCounter", None),  # FB4S Inquiries Counter
+    ("3kOQc4txrHj7dledzdNJ", "person", "customMLSNumber", None),  # MLS Number
+    ("KUpiQ32dAm11q4gu9MB1", "person", "customChromeExtensionLink", None),  # Chrome Extension Link
+    ("ULUCaQYI9uurYn8mfpu9", "property", "url", "N/A"),  # Listing URL
+    ("2C3PcAa0JdOHRu95mWzp", "person", "customListingURLPath", None),  # Listing URL Path
+    ("pwwHyq93djePQzzMECFI", "person", "customAssignedNotFromWillowAt", None),  # Assigned Not From Willow At
+    ("01MYfI09Z919mFibcZNG", "person", "customExpectedPriceRange", None),  # Expected Price Range
+    ("EcWFyMMhEZuLm5hz9wpP", "person", "customProvince", None),  # Province
+    ("fNUZTAUpB0BiA3ff5nSG", "person", "customAddress", None),  # Custom Address
+    ("yIiyCWtlHAkfKrWwin3H", "person", "customCity", None),  # Custom City
+    ("WfBlGcyHtMZIy885bv2q", "person", "customStage", None),  # Stage
+    ("qe4zFdjyWpWlKjUkJ1Oz", "person", "pond", OMIT),  # Pond
+    ("Cv7kNq7m8CBVDh7n9XEj", "person", "customAbandonedPondReason", OMIT),  # Abandoned Pond Reason
+    ("zkkxcKSBxGG0AwKg7zb9", "person", "customPrice", None),  # Price
+    ("kN2l6aNW601zksRV5L0D", "person", "customClosingAnniversary", None),  # Closing Anniversary
+    ("xNiTcYOSPKyG6UK9PHEn", "person", "customYlopoSellerReport", None),  # Ylopo Seller Report
+    ("uvG7VhHmPyqjD976RNoW", "person", "customParentCategory", None),  # Parent Category
+    ("fkIooCxVyocAQeMlwWAo", "person", "customWhoareyou", None),  # Who are you?
+    ("BWFdoHapnpo04EHpG5F0", "person", "customLastActivity", None),  # Last Activity
+    ("SBQ7tdjkwFMumNkfGrHw", "person", "customCloseDate", None),  # Close Date
+    ("SujDeGnOKJXlifbU7fLo", "person", "customLisitngPushesSent", None),  # Lisitng Pushes Sent
+    ("gpGUaXRBHdURtrh7nmlF", "person", "customYlopoStarsLink", None),  # Ylopo Stars Link
+    ("LzbUJkxo7kRClIomCc0U", "person", "customOldID", None),  # Old ID
+)
+
+# Values update never writes, so a partial payload can't blank a field in GHL
+EMPTY_VALUES = (None, "N/A", "", [])
+
+
+def compile_custom_fields(fields=CUSTOM_FIELDS, skip_empty: bool = False):
+    """Turn a field table into a ``transform(person, property_data) -> customField dict`` function.
+
+    The function body is generated once, so a call is a single dict literal (or a run of inline checks
+    when ``skip_empty`` is set) instead of a walk over the table.
+    """
+    lines = [
+        "def transform(person, property_data=None):",
+        "    person_get = person.get",
+        "    property_get = (property_data or _NO_PROPERTY).get",
+    ]
+    if skip_empty:
+        lines.append("    result = {}")
+        for field_id, source, key, _ in fields:
+            lines.append(f"    value = {source}_get({key!r})")
+            lines.append("    if value not in _EMPTY_VALUES:")
+            lines.append(f"        result[{field_id!r}] = value")
+        lines.append("    return result")
+    else:
+        lines.append("    result = {")
+        for field_id, source, key, default in fields:
+            if default is not OMIT:
+                default_arg = "" if default is None else f", {default!r}"
+                lines.append(f"        {field_id!r}: {source}_get({key!r}{default_arg}),")
+        lines.append("    }")
+        for field_id, source, key, default in fields:
+            if default is OMIT:
+                lines.append(f"    value = {source}_get({key!r}, _OMIT)")
+                lines.append("    if value is not _OMIT:")
+                lines.append(f"        result[{field_id!r}] = value")
+        lines.append("    return result")
+    namespace = {"_EMPTY_VALUES": EMPTY_VALUES, "_NO_PROPERTY": {}, "_OMIT": OMIT}
+    exec("\n".join(lines), namespace)
+    return namespace["transform"]
+
+
+# Create sends every field (missing ones as null, OMIT ones not at all); update only sends fields that carry a value
+build_custom_fields = compile_custom_fields()
+build_filled_custom_fields = compile_custom_fields(skip_empty=True)
+
+
+def build_custom_fields_batch(leads, skip_empty: bool = False) -> list:
+    """customField dicts for many lead payloads ({"person": ..., "property": ...}) at once."""
+    transform = build_filled_custom_fields if skip_empty else build_custom_fields
+    return [transform(lead["person"], lead.get("property")) for lead in leads]
@@ -1,21 +1,21 @@
-import os
-import requests
 import logging
 
 from dotenv import load_dotenv
 
+from utils import async_client
+from utils.contact_cache import contact_changed
+from utils.http_client import GHL_BASE_URL
+
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-
-DELETE_LEAD_BASE_URL = "https://rest.gohighlevel.com/v1/contacts/"
+DELETE_LEAD_BASE_URL = GHL_BASE_URL + "contacts/"
 
-def _delete_lead(lead_id):
-    response = requests.delete(DELETE_LEAD_BASE_URL + lead_id, headers=HEADERS)
+async def _delete_lead_async(lead_id):
+    response = await async_client.delete(DELETE_LEAD_BASE_URL + lead_id, ghl_auth=True)
     if response.status_code == 200:
+        await contact_changed(contact_id=lead_id)
         return 200, {"id":{"message":"Successfully deleted"}}
     elif response.status_code == 422:
-        return 422, response.json()
\ No newline at end of file
+        return 422, response.json()
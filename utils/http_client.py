@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from utils import circuit_breaker, metrics
+from utils.rate_limiter import GHL_RATE_LIMIT_MAX_WAIT, ghl_rate_limiter, parse_retry_after
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+GHL_API_KEY = os.getenv("GHL_API_KEY")
+GHL_HEADERS = {"Authorization": f"Bearer {GHL_API_KEY}"}
+GHL_BASE_URL = os.getenv("GHL_BASE_URL", "https://rest.gohighlevel.com/v1/")
+
+# (connect, read) timeouts in seconds used for every upstream call unless overridden
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+
+# How many hosts keep a pool and how many keep-alive connections each pool holds
+POOL_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "32"))
+
+# How many times a GHL call answered with 429 is retried before giving up
+GHL_RATE_LIMIT_RETRIES = int(os.getenv("GHL_RATE_LIMIT_RETRIES", "3"))
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# One session per process: urllib3 keeps a separate pool per host (GHL, Make, Retool, Slack, auto-assign)
+session = _build_session()
+
+
+class UpstreamRateLimited(requests.HTTPError):
+    """GHL still answered 429 after every retry; ``retry_after`` is its last Retry-After in seconds."""
+
+    def __init__(self, *args, retry_after: float = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+def _send(method: str, url: str, **kwargs):
+    with circuit_breaker.protect(url) as outcome, metrics.upstream_call(method, url, kwargs.get("json")) as call:
+        response = session.request(method, url, **kwargs)
+        call.status = outcome.status = response.status_code
+    return response
+
+
+def _retry_wait(attempt: int, retry_after: float):
+    # Seconds to sleep before retrying a 429 with the shared bucket off, None to give up
+    if attempt == GHL_RATE_LIMIT_RETRIES or retry_after > GHL_RATE_LIMIT_MAX_WAIT:
+        return None
+    return retry_after
+
+
+def _send_ghl(method: str, url: str, **kwargs):
+    # Every GHL call takes a slot from the shared bucket when it is on. A 429 is retried after its Retry-After
+    # either way; with the bucket, throttling it makes every worker wait, this call included
+    for attempt in range(GHL_RATE_LIMIT_RETRIES + 1):
+        if ghl_rate_limiter is not None:
+            with metrics.RATE_LIMIT_WAIT.time():
+                ghl_rate_limiter.acquire()
+        response = _send(method, url, **kwargs)
+        if response.status_code != 429:
+            return response
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        logger.warning("GHL returned 429 for %s %s, Retry-After %.1fs (attempt %d)", method, url, retry_after, attempt + 1)
+        if ghl_rate_limiter is not None:
+            ghl_rate_limiter.throttled(retry_after)
+            continue
+        wait = _retry_wait(attempt, retry_after)
+        if wait is None:
+            break
+        time.sleep(wait)
+    raise UpstreamRateLimited(f"GHL rate limit exceeded for {method} {url}", response=response, retry_after=retry_after)
+
+
+def request(method: str, url: str, ghl_auth: bool = False, headers: dict = None, timeout=None, **kwargs):
+    if ghl_auth:
+        headers = {**GHL_HEADERS, **(headers or {})}
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if url.startswith(GHL_BASE_URL):
+        return _send_ghl(method, url, headers=headers, timeout=timeout, **kwargs)
+    return _send(method, url, headers=headers, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def delete(url: str, **kwargs):
+    return request("DELETE", url, **kwargs)
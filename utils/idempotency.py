@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SharedDatabase
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH", os.path.join("data", "idempotency.sqlite3"))
+# Seconds a result is replayed to requests repeating its Idempotency-Key
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+# Requests without the header are matched on route and payload instead, only for as long as webhook retries
+# keep coming, so the same note posted again on purpose later is not swallowed
+IDEMPOTENCY_CONTENT_TTL = int(os.getenv("IDEMPOTENCY_CONTENT_TTL", "600"))
+# How long a duplicate waits for the first request to finish before answering 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "60"))
+# A request still in progress after this many seconds belonged to a worker that died; the next retry runs it
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "300"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Duplicates check for the first request's result this often (seconds); it may finish in another process
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# Expired rows are deleted at most this often (seconds)
+IDEMPOTENCY_PURGE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    response TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at);
+"""
+
+# acquire() outcomes
+STARTED = "started"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def request_key(method: str, path: str, header_key: str, payload: dict):
+    """``(key, fingerprint, ttl)`` of a request: its Idempotency-Key if sent, else a hash of its payload.
+
+    Keys are scoped to the method and path, so one key reused for a note and a task doesn't collide.
+    """
+    fingerprint = _sha256(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str))
+    scope = f"{method} {path}"
+    if header_key:
+        return _sha256(f"{scope}\nkey:{header_key}"), fingerprint, IDEMPOTENCY_KEY_TTL
+    return _sha256(f"{scope}\ncontent:{fingerprint}"), fingerprint, IDEMPOTENCY_CONTENT_TTL
+
+
+class IdempotencyStore:
+    """Results of idempotent requests in SQLite, shared by every worker process.
+
+    The first request for a key inserts an in-progress row and runs; duplicates wait for it and replay its
+    stored response. Only successful responses are stored: a failed first attempt releases the key, so
+    the retry that follows runs for real.
+    """
+
+    def __init__(self, path: str = IDEMPOTENCY_DB_PATH, lock_timeout: int = IDEMPOTENCY_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._db = SharedDatabase(path, SCHEMA)
+        self._last_purge = 0.0
+
+    def _purge(self, connection, now: float):
+        if now - self._last_purge < IDEMPOTENCY_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        connection.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+
+    def try_acquire(self, key: str, fingerprint: str):
+        """One attempt at taking ``key``: ``(outcome, stored response or None)``."""
+        connection = self._db.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._purge(connection, now)
+            row = connection.execute("SELECT * FROM idempotency WHERE key = ?", (key,)).fetchone()
+            if row is not None and row["expires_at"] <= now:
+                connection.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                connection.execute(
+                    "INSERT INTO idempotency (key, fingerprint, status, created_at, expires_at) "
+                    "VALUES (?, ?, 'in_progress', ?, ?)",
+                    (key, fingerprint, now, now + self.lock_timeout),
+                )
+                outcome = STARTED, None
+            elif row["fingerprint"] != fingerprint:
+                outcome = MISMATCH, None
+            elif row["status"] == "done":
+                outcome = REPLAY, json.loads(row["response"])
+            else:
+                outcome = IN_PROGRESS, None
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return outcome
+
+    def acquire(self, key: str, fingerprint: str, timeout: float = IDEMPOTENCY_WAIT_TIMEOUT):
+        """Take ``key``, or wait up to ``timeout`` for the request holding it and return its response."""
+        deadline = time.monotonic() + timeout
+        while True:
+            outcome, response = self.try_acquire(key, fingerprint)
+            if outcome != IN_PROGRESS or time.monotonic() >= deadline:
+                return outcome, response
+            time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+    def complete(self, key: str, response: dict, ttl: int):
+        self._db.connection().execute(
+            "UPDATE idempotency SET status = 'done', response = ?, expires_at = ? WHERE key = ?",
+            (json.dumps(response), time.time() + ttl, key),
+        )
+
+    def release(self, key: str):
+        self._db.connection().execute("DELETE FROM idempotency WHERE key = ? AND status = 'in_progress'", (key,))
+
+
+idempotency_store = IdempotencyStore()
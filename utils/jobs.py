@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from dotenv import load_dotenv
+
+from utils.circuit_breaker import UpstreamUnavailable
+from utils.http_client import UpstreamRateLimited
+from utils.rate_limiter import RateLimitExceeded
+from utils.slack_troubleshooting import send_slack_notification
+from utils.sqlite_db import SharedDatabase
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("data", "jobs.sqlite3"))
+# Worker threads per process; every process sharing JOBS_DB_PATH takes jobs from the same table
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+# Idle workers look for jobs enqueued by other processes this often (seconds)
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+# A job still "running" after this many seconds belonged to a worker that died and is picked up again
+JOBS_STALE_AFTER = int(os.getenv("JOBS_STALE_AFTER", "600"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+# Finished jobs are kept for status polling this long (seconds)
+JOBS_RETENTION = int(os.getenv("JOBS_RETENTION", str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    result_status INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOBS_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._handlers = {}
+        self._db = SharedDatabase(path, SCHEMA)
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads = []
+
+    def register(self, kind: str, handler):
+        # handler(payload) -> (response body, HTTP status)
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._db.connection().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now),
+        )
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str):
+        row = self._db.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "result_status": row["result_status"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _claim(self):
+        connection = self._db.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - JOBS_STALE_AFTER,),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, job_id: str, status: str, result=None, result_status=None, error=None):
+        self._db.connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, result_status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, result_status, error, time.time(), job_id),
+        )
+
+    def _requeue(self, job_id: str):
+        self._db.connection().execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, updated_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+
+    def _process(self, row):
+        job_id = row["id"]
+        if row["attempts"] >= JOBS_MAX_ATTEMPTS:
+            self._finish(job_id, "failed", error="Job was interrupted too many times")
+            return
+        handler = self._handlers.get(row["kind"])
+        if handler is None:
+            self._finish(job_id, "failed", error=f"No handler for job kind {row['kind']}")
+            return
+        try:
+            result, result_status = handler(json.loads(row["payload"]))
+        except (UpstreamUnavailable, RateLimitExceeded, UpstreamRateLimited) as e:
+            # Every job would fail the same way until the breaker lets calls through again, or GHL stops
+            # throttling: wait it out and put the job back without spending one of its attempts
+            logger.warning("Job %s postponed for %ss: %s", job_id, e.retry_after, e)
+            time.sleep(e.retry_after)
+            self._requeue(job_id)
+            return
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            send_slack_notification(f"Error while processing {row['kind']} job {job_id}\n{e}\n{error_msg}")
+            logger.error("Error while processing %s job %s\n%s\n%s", row["kind"], job_id, e, error_msg)
+            self._finish(job_id, "failed", error=str(e))
+            return
+        self._finish(job_id, "succeeded", result=result, result_status=result_status)
+        logger.info("Job %s finished with status %s", job_id, result_status)
+
+    def purge(self):
+        self._db.connection().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (time.time() - JOBS_RETENTION,),
+        )
+
+    def _run_worker(self):
+        while True:
+            try:
+                row = self._claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                row = None
+            if row is None:
+                self._wakeup.wait(JOBS_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._process(row)
+
+    def start(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self.purge()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run_worker, name=f"jobs-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+
+job_queue = JobQueue()
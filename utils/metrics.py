@@ -0,0 +1,175 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+load_dotenv()
+
+# Set by serve.py (or the environment) before this module is imported; every worker process then writes its
+# samples to files there and /metrics adds them up, so a scrape sees the whole server, not one worker
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Upstream base URLs, read here rather than imported so the HTTP clients can import this module
+GHL_BASE_URL = os.getenv("GHL_BASE_URL", "https://rest.gohighlevel.com/v1/")
+UPSTREAM_URLS = (
+    ("make", os.getenv("MAKE_GHL_2_0_AUTH_URL")),
+    ("retool", os.getenv("RETOOL_URL_FOR_SQL")),
+    ("auto_assign", os.getenv("AUTO_ASSIGN_URL")),
+    ("slack", os.getenv("SLACK_BASE_URL", "https://hooks.slack.com/services/")),
+)
+
+# Seconds; upstream calls run from a few ms (cache-warm GHL reads) to the 30s read timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Time of one outbound HTTP call, 429 retries counted separately",
+    ["upstream", "operation"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "Outbound HTTP calls by response status, or exception name when there was none",
+    ["upstream", "operation", "status"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "upstream_requests_in_flight", "Outbound HTTP calls waiting for a response", ["upstream"],
+    multiprocess_mode="livesum",
+)
+RATE_LIMIT_WAIT = Histogram(
+    "ghl_rate_limit_wait_seconds", "Time a GHL call waited for a slot in the shared rate limit bucket",
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, streamed bodies included", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS = Counter("http_requests_total", "Requests served by status", ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served", multiprocess_mode="livesum")
+# hit / (hit + miss) per cache is the hit ratio; counters rather than a ratio gauge so workers add up
+CACHE_LOOKUPS = Counter("cache_lookups_total", "In-process cache lookups", ["cache", "result"])
+SINGLE_FLIGHT_SHARED = Counter(
+    "single_flight_shared_total", "Reads that joined an identical read already in flight instead of calling upstream",
+    ["call"],
+)
+# 0 closed, 1 half-open, 2 open; every worker has its own breakers and the scrape shows the worst of them
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state", "Circuit breaker state per upstream", ["upstream"], multiprocess_mode="livemax",
+)
+BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes by the state entered", ["upstream", "state"],
+)
+BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total", "Outbound calls failed fast because the upstream's breaker was open", ["upstream"],
+)
+
+_ID_SEGMENT = re.compile(r"/contacts/[^/?]+")
+
+
+def _ghl_call(method: str, path: str):
+    # contacts/<id>/notes -> ("ghl_notes", "POST contacts/{id}/notes"); ids never become label values
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    resource = segments[0]
+    if resource == "contacts" and len(segments) > 1 and segments[1] != "lookup":
+        segments[1] = "{id}"
+        if len(segments) > 2 and segments[2] in ("notes", "tasks"):
+            resource = segments[2]
+    upstream = f"ghl_{resource}" if resource in ("contacts", "users", "notes", "tasks") else "ghl"
+    return upstream, f"{method} {'/'.join(segments[:3])}".rstrip()
+
+
+def upstream_of(url: str) -> str:
+    """The upstream service a URL belongs to: ghl, make, retool, auto_assign, slack or other."""
+    if url.startswith(GHL_BASE_URL):
+        return "ghl"
+    for upstream, base_url in UPSTREAM_URLS:
+        if base_url and url.startswith(base_url):
+            return upstream
+    return "other"
+
+
+def classify(method: str, url: str, body=None):
+    """Map an outbound call to low-cardinality ``(upstream, operation)`` labels."""
+    upstream = upstream_of(url)
+    if upstream == "ghl":
+        return _ghl_call(method, url[len(GHL_BASE_URL):])
+    if upstream == "make" and isinstance(body, dict):
+        # One Make scenario serves every 2.0 call, told apart by the action and contact url in the body
+        operation = str(body.get("action") or method)
+        if body.get("url"):
+            operation += " " + _ID_SEGMENT.sub("/contacts/{id}", body["url"])
+        return upstream, operation
+    return upstream, method
+
+
+class _Call:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+@contextmanager
+def upstream_call(method: str, url: str, body=None):
+    """Time one outbound call; the caller sets ``status`` on the yielded object from the response."""
+    upstream, operation = classify(method, url, body)
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream)
+    call = _Call()
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        call.status = type(e).__name__
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(upstream, operation).observe(time.perf_counter() - started)
+        UPSTREAM_REQUESTS.labels(upstream, operation, str(call.status)).inc()
+        in_flight.dec()
+
+
+def cache_lookup(cache: str, hit: bool, result: str = None):
+    CACHE_LOOKUPS.labels(cache, result or ("hit" if hit else "miss")).inc()
+
+
+def init_app(app):
+    """Time every request of ``app``; the route label is the URL rule, so ids don't create new series."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe(error=None):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        HTTP_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        status = 500 if error is not None else g.pop("metrics_status", 500)
+        HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+
+
+def render():
+    """Body and content type for /metrics, aggregated over every worker process when running under serve.py."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    # Drops a dead worker's live gauges (in-flight counts) so they stop adding to the total
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
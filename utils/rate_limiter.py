@@ -0,0 +1,136 @@
+import os
+import time
+from email.utils import parsedate_to_datetime
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SharedDatabase
+
+load_dotenv()
+
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join("data", "rate_limit.sqlite3"))
+# Ceiling for GHL requests per second shared by all worker processes, 0 disables the limiter
+GHL_RATE_LIMIT_PER_SEC = float(os.getenv("GHL_RATE_LIMIT_PER_SEC", "10"))
+GHL_RATE_LIMIT_BURST = float(os.getenv("GHL_RATE_LIMIT_BURST", "10"))
+# A 429 halves the current rate down to this floor
+GHL_RATE_LIMIT_MIN_PER_SEC = float(os.getenv("GHL_RATE_LIMIT_MIN_PER_SEC", "1"))
+# Afterwards the rate grows back by this many requests per second, every second
+GHL_RATE_LIMIT_RECOVERY = float(os.getenv("GHL_RATE_LIMIT_RECOVERY", "0.2"))
+# Wait used when a 429 carries no usable Retry-After header
+GHL_RATE_LIMIT_DEFAULT_BACKOFF = float(os.getenv("GHL_RATE_LIMIT_DEFAULT_BACKOFF", "2"))
+# A call that would have to wait longer than this for its turn fails instead
+GHL_RATE_LIMIT_MAX_WAIT = float(os.getenv("GHL_RATE_LIMIT_MAX_WAIT", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL
+)
+"""
+
+
+class RateLimitExceeded(Exception):
+    """No request slot within ``max_wait``; ``retry_after`` is how long the caller would have had to wait."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, default: float = GHL_RATE_LIMIT_DEFAULT_BACKOFF) -> float:
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class SharedTokenBucket:
+    """Token bucket kept in a SQLite row so every worker process draws from the same budget.
+
+    The rate adapts AIMD-style: ``throttled`` (a 429) halves it and blocks everybody until Retry-After,
+    then it recovers linearly up to ``max_rate``.
+    """
+
+    def __init__(self, name: str, path: str = RATE_LIMIT_DB_PATH, max_rate: float = GHL_RATE_LIMIT_PER_SEC,
+                 burst: float = GHL_RATE_LIMIT_BURST, min_rate: float = GHL_RATE_LIMIT_MIN_PER_SEC,
+                 recovery: float = GHL_RATE_LIMIT_RECOVERY, max_wait: float = GHL_RATE_LIMIT_MAX_WAIT):
+        self.name = name
+        self.path = path
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_rate = min(min_rate, max_rate)
+        self.recovery = recovery
+        self.max_wait = max_wait
+        self._db = SharedDatabase(path, SCHEMA, timeout=10, row_factory=None)
+
+    def _update(self, change):
+        # change(tokens, rate, blocked_until, now) -> (tokens, rate, blocked_until, result)
+        connection = self._db.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, rate, updated_at, blocked_until FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is None:
+                tokens, rate, blocked_until = self.burst, self.max_rate, 0.0
+            else:
+                tokens, rate, updated_at, blocked_until = row
+                elapsed = max(now - updated_at, 0.0)
+                rate = min(self.max_rate, rate + self.recovery * elapsed)
+                tokens = min(self.burst, tokens + rate * elapsed)
+            tokens, rate, blocked_until, result = change(tokens, rate, blocked_until, now)
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, rate, updated_at, blocked_until) VALUES (?, ?, ?, ?, ?)",
+                (self.name, tokens, rate, now, blocked_until),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds the caller has to wait before using it."""
+
+        def take(tokens, rate, blocked_until, now):
+            # Tokens may go negative: later callers queue up behind the ones already waiting
+            wait = max(blocked_until - now, 0.0)
+            tokens -= 1
+            if tokens < 0:
+                wait = max(wait, -tokens / rate)
+            if wait > self.max_wait:
+                return tokens + 1, rate, blocked_until, wait
+            return tokens, rate, blocked_until, wait
+
+        wait = self._update(take)
+        if wait > self.max_wait:
+            raise RateLimitExceeded(f"{self.name} rate limit: no request slot within {self.max_wait:.0f}s", wait)
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def throttled(self, retry_after: float):
+        def back_off(tokens, rate, blocked_until, now):
+            rate = max(self.min_rate, rate / 2)
+            return min(tokens, 0.0), rate, max(blocked_until, now + retry_after), None
+
+        self._update(back_off)
+
+    def current_rate(self) -> float:
+        return self._update(lambda tokens, rate, blocked_until, now: (tokens, rate, blocked_until, rate))
+
+
+ghl_rate_limiter = SharedTokenBucket("ghl") if GHL_RATE_LIMIT_PER_SEC > 0 else None
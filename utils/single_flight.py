@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from utils import metrics
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result or exception.
+
+    ``do`` is for threads and ``do_async`` for coroutines; both wait on the same kind of future, so
+    callers on different threads or event loops join one another. Nothing is cached: once the shared
+    call finishes, the next call with that key runs again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        # key -> concurrent.futures.Future of the call in flight
+        self._calls = {}
+        # Leader tasks of do_async, referenced until done so they can't be garbage collected
+        self._tasks = set()
+
+    def _join(self, key):
+        # (future, is the caller the one that has to run it)
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.SINGLE_FLIGHT_SHARED.labels(self.name).inc()
+                return future, False
+            future = self._calls[key] = concurrent.futures.Future()
+            return future, True
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key, fn, *args):
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self._forget(key, future)
+            future.set_exception(e)
+            raise
+        self._forget(key, future)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key, fn, *args):
+        future, leader = self._join(key)
+        if leader:
+            # The work runs as its own task: a cancelled caller (leader included) stops waiting but the
+            # other callers still get the result
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._settle(key, future, done))
+        # Shielded: wrap_future would pass a waiter's cancellation on to the shared future
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _settle(self, key, future, task):
+        self._tasks.discard(task)
+        self._forget(key, future)
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
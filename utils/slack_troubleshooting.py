@@ -1,15 +1,154 @@
+import atexit
+import logging
 import os
+import queue
+import threading
+import time
+from collections import deque
 
-import requests
 from dotenv import load_dotenv
 
+from utils import http_client
+
 load_dotenv()
 
+logger = logging.getLogger()
+
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
+# Overridable so local runs (see loadtest/) post to a stand-in instead of Slack
+SLACK_BASE_URL = os.getenv("SLACK_BASE_URL", "https://hooks.slack.com/services/")
 
-Slack_URL = f"https://hooks.slack.com/services/{SLACK_WEBHOOK_URL}"
+Slack_URL = f"{SLACK_BASE_URL}{SLACK_WEBHOOK_URL}"
 
+# Messages waiting to be posted; anything beyond this is dropped instead of blocking the request
+SLACK_QUEUE_SIZE = int(os.getenv("SLACK_QUEUE_SIZE", "1000"))
+# Identical errors within this many seconds are posted once, then summarized as "x37 in last 60s"
+SLACK_COALESCE_WINDOW = int(os.getenv("SLACK_COALESCE_WINDOW", "60"))
+# Upper bound of posts per minute, summaries included
+SLACK_RATE_LIMIT_PER_MINUTE = int(os.getenv("SLACK_RATE_LIMIT_PER_MINUTE", "20"))
+# How long interpreter shutdown waits for pending notifications
+SLACK_FLUSH_TIMEOUT = float(os.getenv("SLACK_FLUSH_TIMEOUT", "5"))
+SLACK_POST_TIMEOUT = (3.05, 5)
 
-def send_slack_notification(message: str):
-    requests.post(Slack_URL, json={"text": message})
+_STOP = object()
+
+
+def error_signature(message: str) -> tuple:
+    # Context line plus the last line, which for tracebacks is the exception itself
+    lines = [line for line in message.strip().splitlines() if line.strip()]
+    if not lines:
+        return ("",)
+    return lines[0], lines[-1]
+
+
+class SlackDispatcher:
+    def __init__(self, url: str, queue_size: int = SLACK_QUEUE_SIZE, window: int = SLACK_COALESCE_WINDOW,
+                 per_minute: int = SLACK_RATE_LIMIT_PER_MINUTE):
+        self.url = url
+        self.window = window
+        self.per_minute = per_minute
+        self._queue = queue.Queue(maxsize=queue_size)
+        # signature -> pending group, only touched by the worker thread
+        self._groups = {}
+        self._sent_at = deque()
+        self._dropped = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def notify(self, message: str):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="slack-dispatcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                message = self._queue.get(timeout=1)
+            except queue.Empty:
+                message = None
+            if message is _STOP:
+                self._flush_groups(force=True)
+                return
+            if message is not None:
+                self._handle(message)
+            self._flush_groups()
 
+    def _handle(self, message: str):
+        signature = error_signature(message)
+        group = self._groups.get(signature)
+        if group is not None:
+            group[1] += 1
+            return
+        if len(self._groups) >= self._queue.maxsize:
+            with self._lock:
+                self._dropped += 1
+            return
+        # [window start, occurrences, first message, first message already posted]
+        group = self._groups[signature] = [time.monotonic(), 1, message, False]
+        group[3] = self._post(message)
+
+    def _flush_groups(self, force: bool = False):
+        now = time.monotonic()
+        for signature, (started, count, message, posted) in list(self._groups.items()):
+            if not force and now - started < self.window:
+                continue
+            if posted and count == 1:
+                del self._groups[signature]
+                continue
+            # A group that could not be posted because of the rate limit keeps counting until it can
+            if posted:
+                text = f"x{count} in last {int(now - started)}s: {signature[0]}\n{signature[-1]}"
+            else:
+                text = message if count == 1 else f"x{count} in last {int(now - started)}s: {message}"
+            if self._post(text, force=force):
+                del self._groups[signature]
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        while self._sent_at and now - self._sent_at[0] >= 60:
+            self._sent_at.popleft()
+        if len(self._sent_at) >= self.per_minute:
+            return False
+        self._sent_at.append(now)
+        return True
+
+    def _post(self, text: str, force: bool = False) -> bool:
+        if not self._allow() and not force:
+            return False
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            text += f"\n({dropped} notifications dropped, dispatcher queue was full)"
+        try:
+            http_client.post(self.url, json={"text": text}, timeout=SLACK_POST_TIMEOUT)
+        except Exception as e:
+            logger.warning("Slack notification was not delivered: %s", e)
+        return True
+
+    def close(self, timeout: float = SLACK_FLUSH_TIMEOUT):
+        if self._worker is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+
+
+dispatcher = SlackDispatcher(Slack_URL)
+atexit.register(dispatcher.close)
+
+
+def send_slack_notification(message: str):
+    dispatcher.notify(message)
@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import threading
+
+
+class SharedDatabase:
+    """A SQLite file shared by every worker process, with one connection per thread.
+
+    Connections are opened on first use in a thread: the directory and ``schema`` are created, the
+    journal is WAL so readers don't block the writer, and statements autocommit unless the caller
+    opens a transaction itself (``BEGIN IMMEDIATE`` for read-modify-write).
+    """
+
+    def __init__(self, path: str, schema: str, timeout: float = 30, row_factory=sqlite3.Row, synchronous: str = None):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.row_factory = self.row_factory
+            connection.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            connection.executescript(self.schema)
+            self._local.connection = connection
+        return connection
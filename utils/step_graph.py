@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger()
+
+# The event loop only keeps weak references to tasks; background steps nobody awaits live here until done
+_running = set()
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Marks the exception of a step nobody awaits as retrieved, so it isn't logged as never retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+class StepGraph:
+    """A small dependency graph of upstream calls running as tasks on the current event loop.
+
+    ``add`` starts a step as soon as every step listed in ``after`` has finished and passes their
+    results to it after its own arguments. A failed dependency fails its dependents with the same exception.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timings = {}
+        self._tasks = {}
+        self._started = time.perf_counter()
+
+    def add(self, step: str, fn, *args, after=()) -> asyncio.Task:
+        dependencies = [self._tasks[name] for name in after]
+        task = asyncio.create_task(self._run(step, fn, args, dependencies), name=f"{self.name}: {step}")
+        self._tasks[step] = task
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+        return task
+
+    async def _run(self, step: str, fn, args, dependencies):
+        results = [await dependency for dependency in dependencies]
+        started = time.perf_counter()
+        try:
+            return await fn(*args, *results)
+        finally:
+            self.timings[step] = time.perf_counter() - started
+
+    async def result(self, step: str):
+        return await self._tasks[step]
+
+    def cancel(self, step: str):
+        """Cancel a step whose result won't be used; if it already failed, its exception is discarded."""
+        task = self._tasks.get(step)
+        if task is None:
+            return
+        task.cancel()
+        task.add_done_callback(_retrieve_exception)
+
+    def log_timings(self):
+        total = time.perf_counter() - self._started
+        steps = ", ".join(f"{step}={duration * 1000:.0f}ms" for step, duration in self.timings.items())
+        logger.info("%s took %.0fms: %s", self.name, total * 1000, steps)
@@ -1,20 +1,21 @@
+import asyncio
 import logging
 import os
 
-import requests
-
 from dotenv import load_dotenv
 
+from utils import async_client
+from utils.contact_cache import contact_changed
+from utils.custom_fields import build_filled_custom_fields
+from utils.http_client import GHL_BASE_URL
 from utils.utils import _get_user_by_email
 
 logger = logging.getLogger()
 
 load_dotenv()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
 MAKE_2_0_AUTH_URL = os.getenv('MAKE_GHL_2_0_AUTH_URL')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-UPDATE_BASE_URL = "https://rest.gohighlevel.com/v1/contacts/"
+UPDATE_BASE_URL = GHL_BASE_URL + "contacts/"
 
 
 def prepare_lead_data(data: dict) -> dict:
@@ -39,35 +40,6 @@ def prepare_lead_data(data: dict) -> dict:
     source = data.get("source")
     tags = person_data.get("tags")
 
-    custom_fields = {
-        "R3CCQhYeG4kZ5NSTW5vk": person_data.get("customListingType"),
-        "F4Bkzj3AXKtBiri6S3Xe": person_data.get("customFB4SRCAURL"),
-        "tTqAgy8mKjYaoAWdEqm5": person_data.get("customFB4SLeadID"),
-        "t7EBTF8Ub1JgdGl7N5mE": person_data.get("customBuyerProfileFB4S"),
-        "5k6Sn4LgOC109kGbPKXA": person_data.get("customFB4SInquiriesCounter"),
-        "3kOQc4txrHj7dledzdNJ": person_data.get("customMLSNumber"),
-        "EcWFyMMhEZuLm5hz9wpP": person_data.get("customProvince"),
-        "fNUZTAUpB0BiA3ff5nSG": person_data.get("customAddress"),
-        "yIiyCWtlHAkfKrWwin3H": person_data.get("customCity"),
-        "WfBlGcyHtMZIy885bv2q": person_data.get("customStage"),
-        "qe4zFdjyWpWlKjUkJ1Oz": person_data.get("pond"),
-        "zkkxcKSBxGG0AwKg7zb9": person_data.get("customPrice"),
-        "kN2l6aNW601zksRV5L0D": person_data.get("customClosingAnniversary"),
-        "KUpiQ32dAm11q4gu9MB1": person_data.get("customChromeExtensionLink"),
-        "2C3PcAa0JdOHRu95mWzp": person_data.get("customListingURLPath"),
-        "xNiTcYOSPKyG6UK9PHEn": person_data.get("customYlopoSellerReport"),
-        "fkIooCxVyocAQeMlwWAo": person_data.get("customWhoareyou"),
-        "uvG7VhHmPyqjD976RNoW": person_data.get("customParentCategory"),
-        "BWFdoHapnpo04EHpG5F0": person_data.get("customLastActivity"),
-        "SBQ7tdjkwFMumNkfGrHw": person_data.get("customCloseDate"),
-        "SujDeGnOKJXlifbU7fLo": person_data.get("customLisitngPushesSent"),
-        "gpGUaXRBHdURtrh7nmlF": person_data.get("customYlopoStarsLink"),
-        "pwwHyq93djePQzzMECFI": person_data.get("customAssignedNotFromWillowAt"),
-        "01MYfI09Z919mFibcZNG": person_data.get("customExpectedPriceRange"),
-        "Cv7kNq7m8CBVDh7n9XEj": person_data.get("customAbandonedPondReason"),
-        "LzbUJkxo7kRClIomCc0U": person_data.get("customOldID")
-    }
-
     # Filter out invalid values
     if valid_value(assigned_user_email):
         lead_data["assignedTo"] = _get_user_by_email(assigned_user_email).get("id")
@@ -88,52 +60,70 @@ def prepare_lead_data(data: dict) -> dict:
     if valid_value(tags):
         lead_data["tags"] = tags
 
-    filtered_custom_fields = {k: v for k, v in custom_fields.items() if valid_value(v)}
+    filtered_custom_fields = build_filled_custom_fields(person_data, data.get("property"))
     if filtered_custom_fields:
         lead_data["customField"] = filtered_custom_fields
 
     return lead_data
 
 
-def _update_lead(data: dict, ghl_id: str):
-    prepared_lead_data = prepare_lead_data(data)
-    response = requests.put(UPDATE_BASE_URL + ghl_id, headers=HEADERS, json=prepared_lead_data)
-    logger.info(f"Prepared update data {prepared_lead_data}")
+async def _update_lead_async(data: dict, ghl_id: str):
+    # A users directory miss may refresh it over HTTP, keep that off the loop
+    prepared_lead_data = await asyncio.to_thread(prepare_lead_data, data)
+    response = await async_client.put(UPDATE_BASE_URL + ghl_id, ghl_auth=True, json=prepared_lead_data)
+    logger.info("Prepared update data %s", prepared_lead_data)
     contact = response.json().get("contact")
-    logger.info(f"Update response from GHL:\n{contact}")
+    logger.info("Update response from GHL:\n%s", contact)
+    await contact_changed(contact_id=ghl_id, contact=contact)
     if contact:
         return contact
     return False
 
 
-def add_followers(lead_id: str, data: dict):
+async def _change_followers(lead_id: str, action: str, followers: list):
+    payload = {
+        "url": f"/contacts/{lead_id}/followers",
+        "action": action,
+        "body": str({"followers": followers})
+    }
+    if action == "add":
+        payload["followers"] = followers
+    logger.debug("Followers %s payload %s", action, payload)
+    response = await async_client.post(MAKE_2_0_AUTH_URL, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def add_followers_async(lead_id: str, data: dict):
     request_data = {
         "url": f"/contacts/{lead_id}",
         "action": "get",
     }
 
-    lead = requests.get(MAKE_2_0_AUTH_URL, json=request_data)
-    lead_followers = lead.json().get("contact").get("followers")
-
-    data["url"] = f"/contacts/{lead_id}/followers"
-    data["action"] = "add"
-    raw_followers = data["followers"]
-
-    if lead_followers:
-        new_data = {
-            "url": f"/contacts/{lead_id}/followers",
-            "action": "delete",
-            "body": str({"followers": lead_followers})
-        }
-        delete_response = requests.post(MAKE_2_0_AUTH_URL, json=new_data)
-        delete_response.raise_for_status()
-
-    if raw_followers:
-        data["body"] = str({"followers": raw_followers})
-        print(data)
-        add_response = requests.post(MAKE_2_0_AUTH_URL, json=data)
-        add_response.raise_for_status()
-        return add_response.json()
-
-    return {"status_code": 200}
-
+    response = await async_client.get(MAKE_2_0_AUTH_URL, json=request_data)
+    response.raise_for_status()
+    lead = response.json().get("contact")
+    if not lead:
+        raise ValueError(f"Lead {lead_id} was not found: {response.json()}")
+    lead_followers = lead.get("followers") or []
+
+    # Only the difference between the current and the requested followers is sent
+    desired = list(dict.fromkeys(data["followers"]))
+    to_remove = [follower for follower in lead_followers if follower not in desired]
+    to_add = [follower for follower in desired if follower not in lead_followers]
+    result = {"status_code": 200, "added": to_add, "removed": to_remove}
+    if not to_remove and not to_add:
+        logger.info("Followers of %s are already up to date", lead_id)
+        return result
+
+    # Removed and added followers never overlap, so both calls can run at once
+    calls = []
+    if to_remove:
+        calls.append(_change_followers(lead_id, "delete", to_remove))
+    if to_add:
+        calls.append(_change_followers(lead_id, "add", to_add))
+    responses = await asyncio.gather(*calls)
+    await contact_changed(contact_id=lead_id)
+    if to_add:
+        result["status_code"] = responses[-1].get("status_code")
+    return result
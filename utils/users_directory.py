@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils import http_client, metrics
+from utils.single_flight import SingleFlight
+from utils.http_client import GHL_BASE_URL
+
+load_dotenv()
+
+logger = logging.getLogger()
+
+USERS_URL = GHL_BASE_URL + "users/"
+
+# How often the background thread reloads the users list from GHL
+USERS_DIRECTORY_TTL = int(os.getenv("USERS_DIRECTORY_TTL", "300"))
+# A lookup miss may force a reload (e.g. a freshly added realtor), but not more often than this
+USERS_DIRECTORY_MISS_REFRESH_INTERVAL = int(os.getenv("USERS_DIRECTORY_MISS_REFRESH_INTERVAL", "30"))
+
+
+def normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+class UsersDirectory:
+    """In-memory copy of the GHL users list indexed by email and id.
+
+    Reads never go upstream once the first load succeeded: a daemon thread reloads the list every
+    ``ttl`` seconds and a failed reload keeps serving the previous snapshot.
+    """
+
+    def __init__(self, ttl: int = USERS_DIRECTORY_TTL, miss_refresh_interval: int = USERS_DIRECTORY_MISS_REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        # (users, by_email, by_id) is swapped as a whole, so readers never see a half-built index
+        self._snapshot = None
+        self._last_attempt = 0.0
+        # Callers arriving while a reload is running (cold start, lookup misses) wait for it instead of reloading again
+        self._refreshes = SingleFlight("users_directory")
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher = None
+
+    def _fetch_users(self) -> list:
+        response = http_client.get(USERS_URL, ghl_auth=True)
+        response.raise_for_status()
+        return response.json().get("users") or []
+
+    def refresh(self) -> bool:
+        return self._refreshes.do("users", self._refresh)
+
+    def _refresh(self) -> bool:
+        self._last_attempt = time.monotonic()
+        try:
+            users = self._fetch_users()
+        except Exception:
+            cached = len(self._snapshot[0]) if self._snapshot else 0
+            logger.exception("Users directory refresh failed, serving %d cached users", cached)
+            return False
+        by_email = {}
+        by_id = {}
+        for user in users:
+            if user.get("email"):
+                by_email.setdefault(normalize_email(user["email"]), user)
+            if user.get("id"):
+                by_id[user["id"]] = user
+        self._snapshot = (users, by_email, by_id)
+        logger.info("Users directory refreshed with %d users", len(users))
+        return True
+
+    def invalidate(self):
+        # Keep serving the current snapshot and let the background thread reload it right away
+        self._ensure_refresher()
+        self._wakeup.set()
+
+    def _run_refresher(self):
+        while True:
+            self._wakeup.wait(self.ttl)
+            self._wakeup.clear()
+            self.refresh()
+
+    def _ensure_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._start_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run_refresher, name="users-directory", daemon=True)
+                self._refresher.start()
+
+    def _get_snapshot(self):
+        if self._snapshot is None:
+            self.refresh()
+            if self._snapshot is None:
+                raise RuntimeError("GHL users list is unavailable and there is no cached copy")
+        self._ensure_refresher()
+        return self._snapshot
+
+    def _refresh_on_miss(self) -> bool:
+        if time.monotonic() - self._last_attempt < self.miss_refresh_interval:
+            return False
+        return self.refresh()
+
+    def users(self) -> list:
+        return self._get_snapshot()[0]
+
+    def get_by_email(self, email):
+        key = normalize_email(email)
+        user = self._get_snapshot()[1].get(key)
+        metrics.cache_lookup("ghl_users", user is not None)
+        if user is None and self._refresh_on_miss():
+            user = self._snapshot[1].get(key)
+        return user
+
+    def get_by_id(self, user_id):
+        user = self._get_snapshot()[2].get(user_id)
+        metrics.cache_lookup("ghl_users", user is not None)
+        if user is None and self._refresh_on_miss():
+            user = self._snapshot[2].get(user_id)
+        return user
+
+
+users_directory = UsersDirectory()
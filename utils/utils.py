@@ -1,61 +1,142 @@
+import asyncio
 import os
-import requests
 import logging
+import time
 
 from dotenv import load_dotenv
 
+from utils import async_client
+from utils.circuit_breaker import CIRCUIT_BREAKER_FALLBACK, UpstreamUnavailable, is_failure
+from utils.contact_cache import MISS, lead_cache, remember_assignee
+from utils.contact_mirror import contact_mirror
+from utils.http_client import GHL_BASE_URL
+from utils.single_flight import SingleFlight
+from utils.users_directory import normalize_email, users_directory
+
 load_dotenv()
 
 logger = logging.getLogger()
 
-GHL_API_KEY = os.getenv('GHL_API_KEY')
-HEADERS = {'Authorization': f'Bearer {GHL_API_KEY}'}
-
-LOOKUP_LEAD_URL = "https://rest.gohighlevel.com/v1/contacts/lookup?email="
-BASIC_USER_URL = "https://rest.gohighlevel.com/v1/users/"
-CONTACT_URL = "https://rest.gohighlevel.com/v1/contacts/"
+LOOKUP_LEAD_URL = GHL_BASE_URL + "contacts/lookup?email="
+BASIC_USER_URL = GHL_BASE_URL + "users/"
+CONTACT_URL = GHL_BASE_URL + "contacts/"
 MAKE_GHL_2_0_AUTH_URL = os.getenv('MAKE_GHL_2_0_AUTH_URL')
 
+# Webhooks for a popular lead arrive together; identical reads in flight at the same time share one Make call
+lead_reads = SingleFlight("lead_reads")
+
+
+async def _stale_or_raise(error: UpstreamUnavailable, lookup_stale):
+    # Breaker fallback for lead reads: an outdated contact beats a 503 unless configured otherwise
+    cached = await lookup_stale() if CIRCUIT_BREAKER_FALLBACK == "stale" else MISS
+    if cached is MISS:
+        raise error
+    logger.warning("%s, serving a stale cached contact %s", error, cached.get("id"))
+    return cached
+
+
+async def _stale_by_id(ghl_id):
+    cached = lead_cache.get_stale_by_id(ghl_id)
+    if cached is MISS:
+        cached = await asyncio.to_thread(contact_mirror.get_by_id, ghl_id, stale=True) or MISS
+    return cached
+
 
-def _get_lead_by_id(ghl_id):
+async def _stale_by_email(email):
+    cached = lead_cache.get_stale_by_email(email)
+    if cached is MISS:
+        cached = await asyncio.to_thread(contact_mirror.get_by_email, email, stale=True) or MISS
+    return cached
+
+
+async def _get_lead_by_id_async(ghl_id):
+    cached = lead_cache.get_by_id(ghl_id)
+    if cached is not MISS:
+        logger.info("Found lead by id in cache: %s", ghl_id)
+        return cached
+    mirrored = await asyncio.to_thread(contact_mirror.get_by_id, ghl_id)
+    if mirrored is not None:
+        logger.info("Found lead by id in the contact mirror: %s", ghl_id)
+        return mirrored
+    return await lead_reads.do_async(("id", ghl_id), _fetch_lead_by_id, ghl_id)
+
+
+async def _fetch_lead_by_id(ghl_id):
     payload = {"id": ghl_id, "action": "get_by_id"}
-    response = requests.get(MAKE_GHL_2_0_AUTH_URL, json=payload, headers=HEADERS)
+    started = time.time()
+    try:
+        response = await async_client.get(MAKE_GHL_2_0_AUTH_URL, json=payload, ghl_auth=True)
+    except UpstreamUnavailable as e:
+        return await _stale_or_raise(e, lambda: _stale_by_id(ghl_id))
+    # A failing Make call is an error, not an answer that the contact doesn't exist
+    if is_failure(response.status_code):
+        response.raise_for_status()
     if response.json().get("contact"):
         contact = response.json().get("contact")
-        logger.info(f"Found lead by id: {contact}")
+        logger.info("Found lead by id: %s", contact)
+        lead_cache.put(contact)
+        await asyncio.to_thread(contact_mirror.put, contact, synced_at=started)
+        remember_assignee(contact)
         return contact
+    if response.is_success:
+        await asyncio.to_thread(contact_mirror.forget, contact_id=ghl_id, as_of=started)
     return False
 
 
-def _get_lead_by_email(email):
+async def _get_lead_by_email_async(email):
+    cached = lead_cache.get_by_email(email)
+    if cached is not MISS:
+        logger.info("Lead by email %s served from cache", email)
+        return cached or False
+    mirrored = await asyncio.to_thread(contact_mirror.get_by_email, email)
+    if mirrored is not None:
+        logger.info("Lead by email %s served from the contact mirror", email)
+        return mirrored
+    return await lead_reads.do_async(("email", normalize_email(email)), _fetch_lead_by_email, email)
+
+
+async def _fetch_lead_by_email(email):
     payload = {"email": email, "action": "get_by_email"}
-    response = requests.post(MAKE_GHL_2_0_AUTH_URL, json=payload, headers=HEADERS)
+    started = time.time()
+    try:
+        response = await async_client.post(MAKE_GHL_2_0_AUTH_URL, json=payload, ghl_auth=True)
+    except UpstreamUnavailable as e:
+        return await _stale_or_raise(e, lambda: _stale_by_email(email))
+    if is_failure(response.status_code):
+        response.raise_for_status()
     if response.json().get("contacts"):
         contact = response.json().get("contacts")[0]
-        logger.info(f"Found lead id by email {email}: {contact}")
+        logger.info("Found lead id by email %s: %s", email, contact)
+        lead_cache.put(contact, email=email)
+        await asyncio.to_thread(contact_mirror.put, contact, email=email, synced_at=started)
+        remember_assignee(contact)
         return contact
-    logger.info(f"Lead by email {email} was not found")
+    logger.info("Lead by email %s was not found", email)
+    # Only a successful answer without contacts is remembered as "no such contact"
+    if response.is_success:
+        lead_cache.put_missing(email)
+        await asyncio.to_thread(contact_mirror.forget, email=email, as_of=started)
     return False
 
 
 def _get_user_by_email(email):
-    response = requests.get(BASIC_USER_URL, headers=HEADERS)
-    if response.json().get("users"):
-        for user in response.json().get("users"):
-            if user.get("email") == email:
-                logger.info(f"Found user by email {email}: {user}")
-                return user
-    logger.info(f"User with email:{email} was not found")
+    user = users_directory.get_by_email(email)
+    if user:
+        logger.info("Found user by email %s: %s", email, user)
+        return user
+    logger.info("User with email:%s was not found", email)
     return False
 
 
 def _get_user_by_id(ghl_id):
-    response = requests.get(BASIC_USER_URL + ghl_id, headers=HEADERS)
-    return response.json()
+    user = users_directory.get_by_id(ghl_id)
+    if user:
+        return user
+    return False
 
 
 def _get_users_list():
-    response = requests.get(BASIC_USER_URL, headers=HEADERS)
-    if response.json().get("users"):
-        return response.json().get("users")
+    users = users_directory.users()
+    if users:
+        return users
     return False
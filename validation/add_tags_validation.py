@@ -1,7 +1,9 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 class AddTagsSchema(Schema):
     tags = fields.List(fields.Str())
 
 
-tags_validation = AddTagsSchema()
+tags_validation = FastSchema(AddTagsSchema())
@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 
 class AddressSchema(Schema):
     city = fields.Str()
@@ -70,4 +72,4 @@ class PostLeadSchema(Schema):
     message = fields.Str()
 
 
-post_lead_schema = PostLeadSchema()
+post_lead_schema = FastSchema(PostLeadSchema())
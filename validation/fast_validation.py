@@ -0,0 +1,132 @@
+from marshmallow import RAISE, Schema, ValidationError, fields
+from marshmallow.utils import missing
+
+
+class _Unsupported(Exception):
+    """The schema uses something the fast path does not reproduce; marshmallow handles every load."""
+
+
+class _Invalid(Exception):
+    """The payload is not plainly valid; marshmallow loads it again and reports the errors."""
+
+
+def _check_validators(convert, validators):
+    def checked(value):
+        value = convert(value)
+        for validator in validators:
+            if validator(value) is False:
+                raise _Invalid
+        return value
+
+    return checked
+
+
+def _accept_str(value):
+    if type(value) is not str:
+        raise _Invalid
+    return value
+
+
+def _accept_int(value):
+    # bool is not an int here, and numeric strings are left to marshmallow's conversion
+    if type(value) is not int:
+        raise _Invalid
+    return value
+
+
+def _compile_field(field: fields.Field):
+    if field.load_default is not missing or field.data_key is not None or field.attribute is not None or field.dump_only:
+        raise _Unsupported
+    kind = type(field)
+    if isinstance(field, fields.String) and kind._deserialize is fields.String._deserialize:
+        convert = _accept_str
+    elif isinstance(field, fields.Integer) and kind._deserialize is fields.Integer._deserialize:
+        convert = _accept_int
+    elif kind is fields.Nested:
+        if field.many or field.only or field.exclude or field.unknown not in (None, RAISE):
+            raise _Unsupported
+        convert = _compile_schema(field.schema)
+    elif kind is fields.List:
+        load_item = _compile_value(field.inner)
+
+        def convert(value):
+            if type(value) is not list:
+                raise _Invalid
+            return [load_item(item) for item in value]
+    else:
+        raise _Unsupported
+    if field.validators:
+        convert = _check_validators(convert, tuple(field.validators))
+    return convert
+
+
+def _compile_value(field: fields.Field):
+    # A field's value including the null check, for list items
+    convert = _compile_field(field)
+    allow_none = field.allow_none
+
+    def load_value(value):
+        if value is None:
+            if allow_none:
+                return None
+            raise _Invalid
+        return convert(value)
+
+    return load_value
+
+
+def _compile_schema(schema: Schema):
+    if schema.many or schema.partial or schema.only or schema.exclude or schema.unknown != RAISE:
+        raise _Unsupported
+    if any(schema._hooks.values()):
+        raise _Unsupported
+    plan = tuple(
+        (name, field.required, field.allow_none, _compile_field(field)) for name, field in schema.load_fields.items()
+    )
+    names = frozenset(name for name, *_ in plan)
+
+    def load(data):
+        if type(data) is not dict:
+            raise _Invalid
+        for key in data:
+            if key not in names:
+                raise _Invalid
+        result = {}
+        for name, required, allow_none, convert in plan:
+            if name in data:
+                value = data[name]
+                if value is None:
+                    if not allow_none:
+                        raise _Invalid
+                    result[name] = None
+                else:
+                    result[name] = convert(value)
+            elif required:
+                raise _Invalid
+        return result
+
+    return load
+
+
+class FastSchema:
+    """A marshmallow schema with a precompiled loader for payloads that are plainly valid.
+
+    The loader is built once from the schema's fields and only accepts values marshmallow would
+    return unchanged; anything else (a missing field, a wrong type, a value needing conversion, a
+    failing validator) is loaded again by marshmallow, which returns or raises exactly as before.
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        try:
+            self._load = _compile_schema(schema)
+        except _Unsupported:
+            self._load = None
+
+    def load(self, data):
+        if self._load is not None:
+            try:
+                return self._load(data)
+            except (_Invalid, ValidationError, TypeError, ValueError):
+                pass
+        return self.schema.load(data)
@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 class FollowersSchema(Schema):
     followers = fields.List(
         fields.Str(),
@@ -7,4 +9,4 @@ class FollowersSchema(Schema):
     )
 
 
-followers_schema = FollowersSchema()
\ No newline at end of file
+followers_schema = FastSchema(FollowersSchema())
\ No newline at end of file
@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 
 class PropertySchema(Schema):
     street = fields.Str()
@@ -20,4 +22,4 @@ class NotesSchema(Schema):
     message = fields.Str()
 
 
-notes_validation = NotesSchema()
\ No newline at end of file
+notes_validation = FastSchema(NotesSchema())
\ No newline at end of file
@@ -1,10 +1,13 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 
 class TaskSchema(Schema):
     title = fields.Str(required=True)
     description = fields.Str()
     dueDate = fields.Str(required=True)
+    assignedTo = fields.Str()
 
 
-task_validation = TaskSchema()
\ No newline at end of file
+task_validation = FastSchema(TaskSchema())
\ No newline at end of file
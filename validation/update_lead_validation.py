@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields
 
+from validation.fast_validation import FastSchema
+
 
 class AddressSchema(Schema):
     city = fields.Str()
@@ -57,4 +59,4 @@ class UpdateLeadSchema(Schema):
     person = fields.Nested(PersonSchema, required=True)
 
 
-update_lead_schema = UpdateLeadSchema()
+update_lead_schema = FastSchema(UpdateLeadSchema())